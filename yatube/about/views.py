@@ -1,9 +1,34 @@
+import os
+from datetime import datetime, timezone
+
+from django.template.loader import get_template
+from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView
 
+from core.http_cache import anonymous_page
+
+
+def template_modified(template_name):
+    """Last-Modified статичной страницы — время изменения её шаблона."""
+    def last_modified(request, *args, **kwargs):
+        origin = get_template(template_name).origin.name
+        return datetime.fromtimestamp(
+            os.path.getmtime(origin), timezone.utc
+        )
+    return last_modified
+
 
+@method_decorator(
+    anonymous_page(last_modified_func=template_modified('about/author.html')),
+    name='dispatch',
+)
 class AboutAuthorView(TemplateView):
     template_name = 'about/author.html'
 
 
+@method_decorator(
+    anonymous_page(last_modified_func=template_modified('about/tech.html')),
+    name='dispatch',
+)
 class AboutTechView(TemplateView):
     template_name = 'about/tech.html'
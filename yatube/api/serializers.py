@@ -0,0 +1,54 @@
+"""Компактные JSON-представления моделей posts для API."""
+
+
+def user(author):
+    if author is None:
+        return None
+    return {
+        'username': author.username,
+        'name': author.get_full_name(),
+    }
+
+
+def group(obj):
+    if obj is None:
+        return None
+    return {
+        'slug': obj.slug,
+        'title': obj.title,
+    }
+
+
+def post(obj):
+    """Пост; автор и группа должны быть выбраны select_related."""
+    return {
+        'id': obj.id,
+        'text': obj.text,
+        'pub_date': obj.pub_date.isoformat(),
+        'author': user(obj.author),
+        'group': group(obj.group),
+        'image': obj.image.url if obj.image else None,
+        'comments_count': obj.comments_count,
+    }
+
+
+def comment(obj):
+    return {
+        'id': obj.id,
+        'post': obj.post_id,
+        'parent': obj.parent_id,
+        'depth': obj.depth,
+        'text': obj.text,
+        'created': obj.created.isoformat(),
+        'author': user(obj.author),
+    }
+
+
+def page(page_obj, serializer):
+    """Страница курсорной паджинации: записи и курсоры соседних страниц."""
+    paginator = page_obj.paginator
+    return {
+        'results': [serializer(obj) for obj in page_obj],
+        'next': paginator.next_cursor,
+        'previous': paginator.previous_cursor,
+    }
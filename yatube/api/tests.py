@@ -0,0 +1,150 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {n}'
+            )
+            for n in range(12)
+        ]
+        self.post = self.posts[-1]
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_endpoints(self):
+        """Все ресурсы API отвечают JSON с ETag."""
+        urls = [
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:post_detail', args=[self.post.id]),
+            reverse('api:comments', args=[self.post.id]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(response['ETag'].startswith('"'))
+        detail = self.client.get(urls[3]).json()
+        self.assertEqual(detail['author']['username'], 'author')
+        self.assertEqual(detail['group']['slug'], 'group')
+        self.assertEqual(detail['comments_count'], 1)
+
+    def test_cursor_pagination(self):
+        """Страницы листаются курсором без пропусков и повторов."""
+        first = self.client.get(reverse('api:index')).json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(
+            reverse('api:index'), {'cursor': first['next']}
+        ).json()
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        self.assertIsNone(second['next'])
+
+    def test_not_modified_without_queries(self):
+        """Совпавший ETag даёт 304, не обращаясь к базе."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_changes_on_write(self):
+        """Новый пост или комментарий меняет ETag зависящих ресурсов."""
+        urls = [
+            reverse('api:index'),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:group_list', args=[self.group.slug]),
+        ]
+        before = [self.client.get(url)['ETag'] for url in urls]
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый'
+        )
+        for url, etag in zip(urls, before):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        url = reverse('api:comments', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_etag_covers_payload(self):
+        """Комментарий, название группы и имя автора меняют ETag."""
+        urls = [
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:post_detail', args=[self.post.id]),
+        ]
+
+        def add_comment():
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='Ещё'
+            )
+
+        def rename_group():
+            self.group.title = 'Новая группа'
+            self.group.save()
+
+        def rename_author():
+            self.author.first_name = 'Лев'
+            self.author.save()
+
+        for change in (add_comment, rename_group, rename_author):
+            etags = {url: self.client.get(url)['ETag'] for url in urls}
+            change()
+            for url in urls:
+                with self.subTest(change=change.__name__, url=url):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etags[url]
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    self.assertNotEqual(response['ETag'], etags[url])
+
+    def test_follow_index(self):
+        """Лента подписок требует входа и зависит от подписок."""
+        url = reverse('api:follow_index')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 10)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_not_found(self):
+        """Отсутствующие объекты дают JSON с кодом 404."""
+        response = self.client.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', response.json())
@@ -0,0 +1,196 @@
+"""JSON API v1 для лент, постов и комментариев.
+
+ETag ответа считается из версий поколений core.fragments, тех же,
+что у фрагментов HTML-страниц, и номера страницы (курсора). Ленты
+показывают число комментариев, поэтому в их ETag входит ещё поколение
+comments; имена авторов и групп сбрасывают поколения постов и
+профилей при переименовании (posts.signals). Для этого
+достаточно кэша, поэтому ответ 304 на If-None-Match не делает ни
+одного запроса к базе (лента подписок читает только сессию). Тело
+ответа читается из основной базы: реплика может отставать, а ETag
+обещает клиенту данные не старше версии.
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from core import db_router
+from core.http_cache import make_etag
+from core.queries import query_budget
+from posts.counters import get_stats
+from posts.feed import FeedPaginator
+from posts.models import Comment, Group, Post, User
+from posts.paginator import CursorPaginator
+
+from . import serializers
+
+
+def cursor(request):
+    return request.GET.get('cursor') or ''
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def not_found():
+    return error(HTTPStatus.NOT_FOUND, 'Не найдено.')
+
+
+def reads_primary(view_func):
+    """Читает данные ответа из основной базы, а не с реплики."""
+    @wraps(view_func)
+    def inner(request, *args, **kwargs):
+        db_router.pin()
+        return view_func(request, *args, **kwargs)
+    return inner
+
+
+def get_page(queryset, request, **kwargs):
+    paginator = CursorPaginator(queryset, settings.PAGIN, **kwargs)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def index_etag(request):
+    return make_etag('index', ['posts', 'comments'], cursor(request))
+
+
+def group_etag(request, slug):
+    return make_etag(
+        'group', [f'group:{slug}', 'comments'], slug, cursor(request)
+    )
+
+
+def profile_etag(request, username):
+    return make_etag(
+        'profile', [f'author:{username}', 'comments'], username,
+        cursor(request),
+    )
+
+
+def post_etag(request, post_id):
+    return make_etag('post', [f'post:{post_id}'], post_id)
+
+
+def comments_etag(request, post_id):
+    return make_etag(
+        'comments', [f'post:{post_id}'], post_id, cursor(request)
+    )
+
+
+def follow_etag(request):
+    # Id пользователя берётся из сессии, без запроса к таблице
+    # пользователей; без входа ETag нет и view ответит 401.
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    return make_etag(
+        'follow', ['posts', 'comments', f'follow:{user_id}'], user_id,
+        cursor(request),
+    )
+
+
+@query_budget(1)
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=index_etag)
+@reads_primary
+def index(request):
+    page_obj = get_page(
+        Post.objects.select_related('author', 'group'), request
+    )
+    return JsonResponse(serializers.page(page_obj, serializers.post))
+
+
+@query_budget(2)
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=group_etag)
+@reads_primary
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return not_found()
+    page_obj = get_page(
+        group.posts.select_related('author', 'group'), request,
+        count=group.posts_count,
+    )
+    return JsonResponse({
+        'group': {
+            **serializers.group(group),
+            'description': group.description,
+            'posts_count': group.posts_count,
+        },
+        **serializers.page(page_obj, serializers.post),
+    })
+
+
+@query_budget(3)
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=profile_etag)
+@reads_primary
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return not_found()
+    stats = get_stats(author)
+    page_obj = get_page(
+        author.posts.select_related('author', 'group'), request,
+        count=stats.posts_count,
+    )
+    return JsonResponse({
+        'author': {
+            **serializers.user(author),
+            'posts_count': stats.posts_count,
+        },
+        **serializers.page(page_obj, serializers.post),
+    })
+
+
+@query_budget(1)
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=post_etag)
+@reads_primary
+def post_detail(request, post_id):
+    post = (
+        Post.objects.select_related('author', 'group')
+        .filter(id=post_id).first()
+    )
+    if post is None:
+        return not_found()
+    return JsonResponse(serializers.post(post))
+
+
+@query_budget(2)
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=comments_etag)
+@reads_primary
+def comments(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        return not_found()
+    page_obj = get_page(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        request, keys=('created', 'id'),
+    )
+    return JsonResponse(serializers.page(page_obj, serializers.comment))
+
+
+@query_budget(5)
+@require_safe
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=follow_etag)
+@reads_primary
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error(HTTPStatus.UNAUTHORIZED, 'Нужно войти.')
+    paginator = FeedPaginator(request.user, settings.PAGIN)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse(serializers.page(page_obj, serializers.post))
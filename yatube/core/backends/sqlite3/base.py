@@ -0,0 +1,37 @@
+"""SQLite с настройками для сервера с несколькими воркерами.
+
+Каждое новое соединение получает PRAGMA из PRAGMAS: журнал WAL, при
+котором читатели не ждут писателя, synchronous=NORMAL (в WAL это
+безопасно при сбое процесса), отображение файла в память, больший кэш
+страниц и ожидание блокировки вместо мгновенной ошибки «database is
+locked». Дополнительные или другие значения задаются в
+DATABASES[...]['OPTIONS']['pragmas'].
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение задаёт размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = {
+            **PRAGMAS,
+            **self.settings_dict['OPTIONS'].get('pragmas', {}),
+        }
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
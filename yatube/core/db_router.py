@@ -0,0 +1,58 @@
+"""Маршрутизация чтения на реплики с закреплением за основной базой.
+
+Чтения уходят на случайную реплику из settings.DATABASE_REPLICAS,
+записи — всегда в default. Запрос, который что-то записал, и все
+запросы того же клиента в следующие REPLICA_PIN_SECONDS секунд читают
+из default (cookie ставит ReplicaPinMiddleware), поэтому после
+redirect на пост автор сразу видит свой комментарий.
+
+Состояние закрепления хранится в threading.local: каждый поток
+сервера обрабатывает один запрос за раз. Вне запросов (миграции,
+команды, shell) чтения всегда идут в default.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+def pin(pinned=True):
+    """Закрепляет чтения текущего потока за основной базой."""
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', True)
+
+
+def wrote():
+    """Были ли записи с момента последнего pin()."""
+    return getattr(_state, 'wrote', False)
+
+
+def reads_primary():
+    """Читает ли текущий поток из основной базы."""
+    return not settings.DATABASE_REPLICAS or is_pinned() or wrote()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reads_primary():
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        return {obj1._state.db, obj2._state.db} <= databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
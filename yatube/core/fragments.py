@@ -0,0 +1,131 @@
+"""Кэш фрагментов шаблонов с версиями вместо TTL.
+
+Версия фрагмента складывается из счётчиков поколений. Запись модели
+увеличивает счётчики тех поколений, которые она затрагивает, после
+чего ключи старых фрагментов больше не запрашиваются и вытесняются
+из кэша сами. Поэтому фрагменты живут без таймаута и устаревают в
+момент записи, а не через фиксированное время.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+GENERATION_PREFIX = 'gen:'
+FRAGMENT_PREFIX = 'fragment:'
+STATS_PREFIX = 'fragment-stats:'
+STATS_NAMES = 'fragment-stats'
+# Поколение, которое входит в каждую версию: его увеличение
+# сбрасывает все фрагменты сразу.
+EPOCH = '*'
+# Статистика копится в процессе и сбрасывается в кэш пачками, чтобы
+# не добавлять по записи в кэш на каждый отрисованный фрагмент.
+FLUSH_EVERY = 100
+FLUSH_SECONDS = 10
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _fresh():
+    # Потерянный счётчик стартует со значения, которого точно не было,
+    # иначе после вытеснения снова стали бы видны старые фрагменты.
+    return time.time_ns()
+
+
+def version(*names):
+    """Текущая версия набора поколений одной строкой."""
+    keys = [GENERATION_PREFIX + name for name in (EPOCH, *names)]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh(), None)
+            found[key] = cache.get(key)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def bump(*names):
+    """Делает устаревшими все фрагменты, зависящие от поколений."""
+    for name in names:
+        key = GENERATION_PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh(), None)
+
+
+def bump_all():
+    """Делает устаревшими все фрагменты с версией, например после импорта."""
+    bump(EPOCH)
+
+
+def make_key(name, vary_on):
+    digest = hashlib.md5(
+        ':'.join(str(value) for value in vary_on).encode()
+    ).hexdigest()
+    return f'{FRAGMENT_PREFIX}{name}:{digest}'
+
+
+def prefetch(specs):
+    """Достаёт пачку фрагментов одним обращением к кэшу.
+
+    specs — пары (имя фрагмента, значения для ключа), как в теге
+    fragment. В ответе есть все запрошенные ключи, у промахов None;
+    словарь кладут в контекст под именем fragments.
+    """
+    keys = [make_key(name, vary_on) for name, vary_on in specs]
+    found = cache.get_many(keys)
+    return {key: found.get(key) for key in keys}
+
+
+def record(name, hit):
+    """Учитывает попадание или промах фрагмента."""
+    with _pending_lock:
+        _pending[name, 'hits' if hit else 'misses'] += 1
+        due = (
+            sum(_pending.values()) >= FLUSH_EVERY
+            or time.monotonic() - _flushed_at > FLUSH_SECONDS
+        )
+    if due:
+        flush()
+
+
+def flush():
+    """Переносит накопленную статистику процесса в общий кэш."""
+    global _flushed_at
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    new_names = set()
+    for (name, outcome), delta in pending.items():
+        key = f'{STATS_PREFIX}{name}:{outcome}'
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if cache.add(key, delta, None):
+                new_names.add(name)
+            else:
+                cache.incr(key, delta)
+    if new_names:
+        names = cache.get(STATS_NAMES, set())
+        cache.set(STATS_NAMES, names | new_names, None)
+
+
+def stats():
+    """Попадания, промахи и доля попаданий по каждому фрагменту."""
+    flush()
+    result = {}
+    for name in sorted(cache.get(STATS_NAMES, set())):
+        hits = cache.get(f'{STATS_PREFIX}{name}:hits', 0)
+        misses = cache.get(f'{STATS_PREFIX}{name}:misses', 0)
+        total = hits + misses
+        result[name] = {
+            'hits': hits,
+            'misses': misses,
+            'ratio': hits / total if total else 0.0,
+        }
+    return result
@@ -0,0 +1,78 @@
+"""Заголовки HTTP-кэширования для HTML-страниц.
+
+Анонимным посетителям страницы отдаются с Cache-Control: public, ETag
+и Last-Modified, и повторный запрос с If-None-Match или
+If-Modified-Since получает 304 без отрисовки шаблона. Для вошедших
+пользователей страница своя (меню, формы с CSRF), поэтому она
+private и не переиспользуется. В обоих случаях ответ зависит от Cookie.
+
+ETag считается из версий поколений core.fragments и ставится, только
+если данные читаются из основной базы: реплика может отставать от
+версии в кэше. Last-Modified берётся из самих данных и годится всегда.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import db_router, fragments
+
+
+def make_etag(*parts):
+    """ETag из версий поколений и прочих ключей страницы.
+
+    Части-списки считаются именами поколений.
+    """
+    values = [
+        fragments.version(*part) if isinstance(part, list) else part
+        for part in parts
+    ]
+    return hashlib.md5(
+        ':'.join(str(value) for value in values).encode()
+    ).hexdigest()
+
+
+def anonymous_page(etag_func=None, last_modified_func=None):
+    """Условные ответы и публичное кэширование страницы для анонимов.
+
+    Функции получают те же аргументы, что и view, как у
+    django.views.decorators.http.condition.
+    """
+    def decorator(view_func):
+        def etag(request, *args, **kwargs):
+            if etag_func is None or not db_router.reads_primary():
+                return None
+            return etag_func(request, *args, **kwargs)
+
+        conditional = condition(
+            etag_func=etag, last_modified_func=last_modified_func
+        )(view_func)
+
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            anonymous = (
+                request.method in ('GET', 'HEAD')
+                and not request.user.is_authenticated
+            )
+            if not anonymous:
+                response = view_func(request, *args, **kwargs)
+                patch_cache_control(response, private=True, max_age=0)
+            else:
+                response = conditional(request, *args, **kwargs)
+                shared = (
+                    response.status_code in (200, 304)
+                    and not response.cookies
+                )
+                if not shared:
+                    patch_cache_control(response, private=True, max_age=0)
+                else:
+                    patch_cache_control(
+                        response, public=True,
+                        max_age=settings.ANONYMOUS_PAGE_MAX_AGE,
+                    )
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return inner
+    return decorator
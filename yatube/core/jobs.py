@@ -0,0 +1,198 @@
+"""Очередь фоновых задач с базой данных в роли брокера.
+
+Задачи регистрируются декоратором task под именем и ставятся в
+очередь вызовом enqueue(name, *args, key=...). Аргументы хранятся в
+JSON. Задача с ключом идемпотентности ставится не больше одного раза:
+повторный enqueue с тем же ключом ничего не делает.
+
+Воркер (manage.py run_jobs) в нескольких потоках забирает задачи,
+срок которых подошёл. Задача захватывается условным UPDATE, поэтому
+два воркера не возьмут одну и ту же. Упавшая задача повторяется через
+JOB_BACKOFF_SECONDS * 2 ** (попытка - 1) секунд, а после
+JOB_MAX_ATTEMPTS попыток остаётся в состоянии failed с текстом ошибки.
+
+При JOBS_EAGER задачи выполняются сразу в вызывающем потоке, и
+отдельный воркер не нужен.
+"""
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name, max_attempts=None):
+    """Регистрирует функцию как задачу очереди."""
+    def decorator(func):
+        _registry[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, *args, key=None, delay=0):
+    """Ставит задачу в очередь или, при JOBS_EAGER, выполняет сразу."""
+    if name not in _registry:
+        raise KeyError(f'Неизвестная задача {name}')
+    if settings.JOBS_EAGER:
+        func, _ = _registry[name]
+        func(*args)
+        return
+    Job.objects.bulk_create([
+        Job(
+            name=name,
+            payload=json.dumps(args),
+            key=key,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+    ], ignore_conflicts=True)
+
+
+def backoff(attempts):
+    """Пауза перед следующей попыткой после attempts неудачных."""
+    return min(
+        settings.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1),
+        settings.JOB_BACKOFF_MAX,
+    )
+
+
+def release_expired():
+    """Возвращает в очередь задачи, чей воркер не уложился в срок."""
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_until__lt=timezone.now()
+    ).update(status=Job.QUEUED, locked_until=None)
+
+
+def claim():
+    """Захватывает ближайшую задачу, срок которой подошёл, или None."""
+    while True:
+        now = timezone.now()
+        candidate = (
+            Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        claimed = Job.objects.filter(
+            id=candidate, status=Job.QUEUED
+        ).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        )
+        if claimed:
+            return Job.objects.get(id=candidate)
+
+
+def run(job):
+    """Выполняет захваченную задачу и записывает итог."""
+    func, max_attempts = _registry.get(job.name, (None, None))
+    max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+    started = time.monotonic()
+    try:
+        if func is None:
+            raise KeyError(f'Неизвестная задача {job.name}')
+        func(*json.loads(job.payload))
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= max_attempts or func is None:
+            logger.error('Задача %s не выполнена:\n%s', job, error)
+            fields = {'status': Job.FAILED}
+        else:
+            delay = backoff(job.attempts)
+            logger.warning('Задача %s упала, повтор через %s с', job, delay)
+            fields = {
+                'status': Job.QUEUED,
+                'run_at': timezone.now() + timedelta(seconds=delay),
+            }
+        Job.objects.filter(id=job.id).update(
+            last_error=error, locked_until=None, updated=timezone.now(),
+            **fields,
+        )
+        return False
+    Job.objects.filter(id=job.id).update(
+        status=Job.DONE, locked_until=None, updated=timezone.now()
+    )
+    logger.info('Задача %s выполнена за %.0f мс', job,
+                (time.monotonic() - started) * 1000)
+    return True
+
+
+def prune():
+    """Удаляет выполненные задачи старше JOB_KEEP_SECONDS.
+
+    Пока выполненная задача хранится, её ключ не даёт поставить её
+    в очередь повторно.
+    """
+    border = timezone.now() - timedelta(seconds=settings.JOB_KEEP_SECONDS)
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE, updated__lt=border
+    ).delete()
+    return deleted
+
+
+def work(stop, poll=1.0, once=False):
+    """Цикл потока воркера до stop или, с once, до пустой очереди."""
+    done = 0
+    while not stop.is_set():
+        close_old_connections()
+        job = claim()
+        if job is None:
+            if once:
+                break
+            stop.wait(poll)
+            continue
+        run(job)
+        done += 1
+    close_old_connections()
+    return done
+
+
+def run_workers(concurrency, poll=1.0, once=False, stop=None):
+    """Запускает потоки воркера и ждёт их завершения."""
+    stop = stop or threading.Event()
+    release_expired()
+    prune()
+    counts = []
+    threads = [
+        threading.Thread(
+            target=lambda: counts.append(work(stop, poll, once)),
+            name=f'jobs-{number}',
+        )
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=poll)
+            if not once:
+                release_expired()
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return sum(counts)
+
+
+def stats():
+    """Число задач по именам и состояниям."""
+    result = {}
+    rows = Job.objects.values('name', 'status').annotate(total=Count('id'))
+    for row in rows:
+        result.setdefault(row['name'], {})[row['status']] = row['total']
+    return result
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import fragments
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю попаданий в кэш по каждому фрагменту.'
+
+    def handle(self, *args, **options):
+        for name, row in fragments.stats().items():
+            self.stdout.write(
+                f'{name:<20} попаданий {row["hits"]:>8} '
+                f'промахов {row["misses"]:>8} доля {row["ratio"]:.1%}'
+            )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import jobs
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Показывает число задач очереди по именам и состояниям.'
+
+    def handle(self, *args, **options):
+        for name, counts in sorted(jobs.stats().items()):
+            row = ' '.join(
+                f'{status} {counts.get(status, 0):>6}'
+                for status, _ in Job.STATUSES
+            )
+            self.stdout.write(f'{name:<24} {row}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core import page_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает попадания и промахи кэша целых страниц по каждому '
+        'адресу и число сброшенных страниц.'
+    )
+
+    def handle(self, *args, **options):
+        result = page_cache.stats()
+        for name, row in result['pages'].items():
+            self.stdout.write(
+                f'{name:<24} попаданий {row["hits"]:>8} '
+                f'промахов {row["misses"]:>8} доля {row["ratio"]:.1%}'
+            )
+        self.stdout.write(f'Сброшено страниц: {result["purges"]}')
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from core import template_profiler
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает страницу несколько раз и показывает, сколько '
+        'времени ушло на каждый шаблон и тег. Кэш целых страниц на время '
+        'замера выключен, кэш фрагментов работает как обычно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--user', help='Войти под этим пользователем')
+        parser.add_argument('--limit', type=int, default=15)
+
+    def handle(self, *args, **options):
+        client = Client()
+        if options['user']:
+            user = get_user_model().objects.filter(
+                username=options['user']
+            ).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+            client.force_login(user)
+        template_profiler.install()
+        with override_settings(PAGE_CACHE=False), \
+                template_profiler.profile() as profile:
+            for _ in range(options['repeat']):
+                response = client.get(options['url'])
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{options["url"]} ответил {response.status_code}'
+                    )
+        summary = profile.summary(options['limit'])
+        repeat = options['repeat']
+        self.stdout.write(
+            f'Отрисовка за запрос: {summary["render_ms"] / repeat:.2f} мс'
+        )
+        for title in ('templates', 'tags'):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            for row in summary[title]:
+                self.stdout.write(
+                    f'{row["name"]:<36} {row["count"] / repeat:>7.1f} раз '
+                    f'{row["ms"] / repeat:>8.2f} мс'
+                )
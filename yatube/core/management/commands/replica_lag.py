@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Показывает отставание каждой реплики от основной базы.'
+
+    def handle(self, *args, **options):
+        for alias in settings.DATABASE_REPLICAS:
+            lag = replicas.lag(alias)
+            shown = 'нет данных' if lag is None else f'{lag:.1f} с'
+            self.stdout.write(f'{alias}: {shown}')
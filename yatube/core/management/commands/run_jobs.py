@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи очереди core.jobs в нескольких потоках. '
+        'С --once выходит, когда задач со сроком не осталось.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOB_WORKERS,
+            help='Число потоков воркера'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста'
+        )
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        done = jobs.run_workers(
+            options['concurrency'], poll=options['poll'],
+            once=options['once'],
+        )
+        self.stdout.write(f'Обработано задач: {done}')
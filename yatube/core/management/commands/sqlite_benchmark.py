@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.backends.sqlite3.base import PRAGMAS
+
+# Режимы сравнения: настройки SQLite по умолчанию и настройки бэкенда.
+MODES = {
+    'default': {},
+    'tuned': PRAGMAS,
+}
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+
+def prepare(path, rows):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+        'pub_date REAL)'
+    )
+    connection.execute('CREATE INDEX post_pub_date ON post (pub_date)')
+    connection.executemany(
+        'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+        ((f'Пост номер {n}', n) for n in range(rows)),
+    )
+    connection.commit()
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite на чтение и запись при '
+        'конкурентной нагрузке с настройками по умолчанию и с PRAGMA '
+        'бэкенда core.backends.sqlite3.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести итог в JSON'
+        )
+
+    def run(self, mode, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            prepare(path, options['rows'])
+            pragmas = MODES[mode]
+            counts = {'reads': 0, 'writes': 0, 'busy': 0}
+            lock = threading.Lock()
+            stop = time.monotonic() + options['seconds']
+
+            def reader():
+                connection = connect(path, pragmas)
+                done = 0
+                while time.monotonic() < stop:
+                    connection.execute(
+                        'SELECT id, text FROM post '
+                        'ORDER BY pub_date DESC LIMIT 10'
+                    ).fetchall()
+                    done += 1
+                connection.close()
+                with lock:
+                    counts['reads'] += done
+
+            def writer():
+                connection = connect(path, pragmas)
+                done = busy = 0
+                while time.monotonic() < stop:
+                    try:
+                        with connection:
+                            connection.execute(
+                                'INSERT INTO post (text, pub_date) '
+                                'VALUES (?, ?)',
+                                ('Новый пост', time.time()),
+                            )
+                        done += 1
+                    except sqlite3.OperationalError:
+                        busy += 1
+                connection.close()
+                with lock:
+                    counts['writes'] += done
+                    counts['busy'] += busy
+
+            threads = (
+                [threading.Thread(target=reader)
+                 for _ in range(options['readers'])]
+                + [threading.Thread(target=writer)
+                   for _ in range(options['writers'])]
+            )
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        seconds = options['seconds']
+        return {
+            'mode': mode,
+            'reads_per_second': round(counts['reads'] / seconds),
+            'writes_per_second': round(counts['writes'] / seconds),
+            'busy_errors': counts['busy'],
+        }
+
+    def handle(self, *args, **options):
+        results = [self.run(mode, options) for mode in MODES]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            self.stdout.write(
+                f'{row["mode"]:<8} чтений/с {row["reads_per_second"]:>8} '
+                f'записей/с {row["writes_per_second"]:>6} '
+                f'ошибок блокировки {row["busy_errors"]:>4}'
+            )
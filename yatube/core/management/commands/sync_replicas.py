@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу в локальные реплики из DB_REPLICAS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд, пока не прервут'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте DB_REPLICAS')
+        while True:
+            replicas.beat()
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.monotonic()
+                replicas.sync(alias)
+                self.stdout.write(
+                    f'{alias}: {(time.monotonic() - started) * 1000:.0f} мс'
+                )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
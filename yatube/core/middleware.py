@@ -0,0 +1,116 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import db_router, template_profiler
+from .queries import QueryStats
+
+logger = logging.getLogger('core.queries')
+template_logger = logging.getLogger('core.templates')
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы каждого view и сверяет их с бюджетом.
+
+    Итог отдаётся заголовком Server-Timing и одной строкой JSON
+    в логгер core.queries: обычный запрос с DEBUG, превышение бюджета
+    с WARNING.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.2f};'
+            f'desc="{stats.count} queries"'
+        )
+        self.log(request, response, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = request.query_stats
+        stats.view = f'{view_func.__module__}.{view_func.__name__}'
+        stats.budget = getattr(view_func, 'query_budget', None)
+
+    def log(self, request, response, stats):
+        level = logging.WARNING if stats.over_budget else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+        logger.log(level, json.dumps({
+            'view': stats.view,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'budget': stats.budget,
+            'db_ms': round(stats.duration * 1000, 2),
+            'duplicates': stats.duplicates,
+        }, ensure_ascii=False))
+
+
+class ReplicaPinMiddleware:
+    """Держит клиента на основной базе после его записей.
+
+    Небезопасные методы и запросы с cookie закрепления читают из
+    default. Если запрос что-то записал, cookie ставится на
+    REPLICA_PIN_SECONDS секунд.
+    """
+
+    cookie = 'db_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.pin(
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or self.cookie in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+            if db_router.wrote() and settings.DATABASE_REPLICAS:
+                response.set_cookie(
+                    self.cookie, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite='Lax',
+                )
+        finally:
+            db_router.pin()
+        return response
+
+
+class TemplateProfilerMiddleware:
+    """Раскладывает время отрисовки ответа по шаблонам и тегам.
+
+    Включается settings.TEMPLATE_PROFILING. Итог добавляется в
+    Server-Timing и пишется строкой JSON в логгер core.templates.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILING:
+            raise MiddlewareNotUsed
+        template_profiler.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with template_profiler.profile() as profile:
+            response = self.get_response(request)
+        summary = profile.summary()
+        timing = f'tpl;dur={summary["render_ms"]:.2f};desc="templates"'
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+        template_logger.info(json.dumps(
+            {'path': request.path, **summary}, ensure_ascii=False
+        ))
+        return response
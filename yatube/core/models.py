@@ -0,0 +1,60 @@
+from django.db import models
+
+
+class Heartbeat(models.Model):
+    """Метка времени в основной базе, по которой меряют отставание реплик.
+
+    sync_replicas обновляет её перед копированием, и на реплике
+    оказывается время последней синхронизации.
+    """
+
+    beat = models.DateTimeField('Метка')
+
+    class Meta:
+        verbose_name = 'Метка синхронизации'
+        verbose_name_plural = 'Метки синхронизации'
+
+
+class Job(models.Model):
+    """Фоновая задача очереди core.jobs."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    payload = models.TextField('Аргументы', default='[]')
+    # Задача с ключом ставится в очередь не больше одного раза.
+    key = models.CharField(
+        'Ключ идемпотентности', max_length=200, null=True, unique=True
+    )
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить после')
+    # Пока срок не вышел, задача принадлежит взявшему её воркеру;
+    # задачу упавшего воркера потом возьмёт другой.
+    locked_until = models.DateTimeField('Занята до', null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    updated = models.DateTimeField('Изменена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'], name='job_status_run_at_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk}'
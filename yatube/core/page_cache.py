@@ -0,0 +1,129 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Ответ хранится по пути и строке запроса, поэтому страницы ленты с
+разными курсорами кэшируются отдельно. Каждому пути соответствует
+поколение core.fragments: purge(path) увеличивает его, и все
+сохранённые варианты этого пути (с любыми курсорами) перестают
+отдаваться. Запись поста сбрасывает только свои страницы, остальной
+кэш не трогается; fragments.bump_all() сбрасывает все страницы.
+
+Попадания и промахи учитываются через core.fragments.record под
+именами page:<имя url>, сбросы — отдельным счётчиком.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import db_router, fragments
+
+PAGE_PREFIX = 'page:'
+PURGES_KEY = 'page-stats:purges'
+# Заголовки, которые сохраняются вместе с телом страницы.
+HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control',
+           'Vary')
+
+
+def _digest(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def _generation(path):
+    return f'path:{_digest(path)}'
+
+
+def purge(*paths):
+    """Перестаёт отдавать сохранённые варианты страниц по путям.
+
+    Пути приходят как их отдаёт reverse(), с %-кодированием, а
+    страница ищется по раскодированному request.path, поэтому
+    поколение считается от раскодированного пути.
+    """
+    if not paths:
+        return
+    fragments.bump(*(_generation(unquote(path)) for path in paths))
+    try:
+        cache.incr(PURGES_KEY, len(paths))
+    except ValueError:
+        if not cache.add(PURGES_KEY, len(paths), None):
+            cache.incr(PURGES_KEY, len(paths))
+
+
+def cacheable(request):
+    return (
+        settings.PAGE_CACHE
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def _restore(request, entry):
+    response = HttpResponse(entry['content'])
+    for name, value in entry['headers'].items():
+        response[name] = value
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(
+            response.get('Last-Modified', '')
+        ),
+        response=response,
+    )
+
+
+def _store(key, version, response):
+    if (
+        response.status_code != 200
+        or response.streaming
+        or response.cookies
+        or 'private' in response.get('Cache-Control', '')
+    ):
+        return
+    # Страница по данным реплики может отставать от записи, после
+    # которой её сбросили, поэтому живёт недолго.
+    timeout = (
+        settings.PAGE_CACHE_TIMEOUT if db_router.reads_primary()
+        else settings.REPLICA_FRAGMENT_TIMEOUT
+    )
+    cache.set(key, {
+        'version': version,
+        'content': response.content,
+        'headers': {
+            name: response[name] for name in HEADERS if name in response
+        },
+    }, timeout)
+
+
+def cached_page(view_func):
+    """Отдаёт анонимам сохранённый ответ view без его выполнения."""
+    @wraps(view_func)
+    def inner(request, *args, **kwargs):
+        if not cacheable(request):
+            return view_func(request, *args, **kwargs)
+        name = f'page:{view_func.__name__}'
+        key = PAGE_PREFIX + _digest(request.get_full_path())
+        version = fragments.version(_generation(request.path))
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            fragments.record(name, True)
+            return _restore(request, entry)
+        fragments.record(name, False)
+        response = view_func(request, *args, **kwargs)
+        if request.method == 'GET':
+            _store(key, version, response)
+        return response
+    return inner
+
+
+def stats():
+    """Попадания и промахи по страницам и общее число сбросов."""
+    pages = {
+        name: row for name, row in fragments.stats().items()
+        if name.startswith('page:')
+    }
+    return {'pages': pages, 'purges': cache.get(PURGES_KEY, 0)}
@@ -0,0 +1,48 @@
+"""Учёт SQL-запросов, которые делает один HTTP-запрос."""
+import time
+from collections import Counter
+
+
+class QueryStats:
+    """Обёртка для connection.execute_wrapper, считающая запросы.
+
+    Запросы сравниваются по тексту SQL с плейсхолдерами, поэтому
+    одинаковые запросы с разными параметрами (типичный N+1) попадают
+    в один отпечаток.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.view = None
+        self.budget = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Отпечатки запросов, выполненных больше одного раза."""
+        return {
+            sql: total for sql, total in self.fingerprints.items()
+            if total > 1
+        }
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может сделать view."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
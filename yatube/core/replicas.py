@@ -0,0 +1,40 @@
+"""Локальные реплики: копии основной SQLite-базы и их отставание."""
+import sqlite3
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .db_router import PRIMARY
+from .models import Heartbeat
+
+
+def beat():
+    """Обновляет метку в основной базе."""
+    Heartbeat.objects.using(PRIMARY).update_or_create(
+        id=1, defaults={'beat': timezone.now()}
+    )
+
+
+def sync(alias):
+    """Копирует основную базу в реплику alias через backup API SQLite."""
+    connections[alias].close()
+    source = sqlite3.connect(settings.DATABASES[PRIMARY]['NAME'])
+    target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def lag(alias):
+    """Отставание реплики в секундах или None, если метки ещё нет.
+
+    На реплике лежит метка, записанная в основную базу перед последней
+    синхронизацией, так что её возраст и есть отставание данных.
+    """
+    replica = Heartbeat.objects.using(alias).filter(id=1).first()
+    if replica is None:
+        return None
+    return (timezone.now() - replica.beat).total_seconds()
@@ -0,0 +1,99 @@
+"""Предварительная компиляция всех шаблонов проекта.
+
+Шаблоны загружает django.template.loaders.cached.Loader, который
+держит скомпилированные шаблоны в памяти процесса, общей для всех
+потоков. compile_all() проходит по каталогам шаблонов (DIRS и
+templates/ приложений), компилирует каждый файл и так прогревает
+этот кэш до первого запроса. Заодно проверяются {% extends %} и
+{% include %} с именем-строкой: такой шаблон должен существовать.
+
+Ошибки показывает системная проверка core.E001 (manage.py check,
+runserver, migrate), а WSGI-приложение не запускается с ними вовсе.
+"""
+import os
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.template.utils import get_app_template_dirs
+
+
+def template_dirs(engine):
+    """Каталоги шаблонов движка: DIRS и templates/ приложений."""
+    dirs = list(engine.dirs)
+    if engine.app_dirs or any(
+        'app_directories' in str(loader) for loader in engine.loaders
+    ):
+        dirs += get_app_template_dirs('templates')
+    return dirs
+
+
+def template_names(directory):
+    """Имена всех файлов шаблонов каталога."""
+    names = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            path = os.path.relpath(os.path.join(root, file), directory)
+            names.append(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def _literal(expression):
+    """Имя шаблона, если оно задано строкой, а не переменной."""
+    if expression is None or expression.filters:
+        return None
+    return expression.var if isinstance(expression.var, str) else None
+
+
+def _references(template):
+    nodes = template.nodelist.get_nodes_by_type(ExtendsNode)
+    names = [_literal(node.parent_name) for node in nodes]
+    nodes = template.nodelist.get_nodes_by_type(IncludeNode)
+    names += [_literal(node.template) for node in nodes]
+    return [name for name in names if name]
+
+
+def compile_all():
+    """Компилирует все шаблоны; возвращает список (имя, ошибка).
+
+    Ссылки на другие шаблоны проверяются только у шаблонов из DIRS и
+    приложений проекта: виджеты contrib подключают шаблоны рендерера
+    форм, которых нет среди шаблонов движка.
+    """
+    errors = []
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for directory in template_dirs(engine):
+            own = (
+                directory in engine.dirs
+                or str(directory).startswith(str(settings.BASE_DIR))
+            )
+            for name in template_names(directory):
+                try:
+                    template = engine.get_template(name)
+                    for reference in _references(template) if own else ():
+                        engine.get_template(reference)
+                except (TemplateSyntaxError, TemplateDoesNotExist) as error:
+                    errors.append((name, f'{type(error).__name__}: {error}'))
+    return errors
+
+
+def warm():
+    """Прогревает кэш шаблонов при старте; с ошибками не даёт стартовать."""
+    errors = compile_all()
+    if errors:
+        raise ImproperlyConfigured('\n'.join(
+            f'{name}: {message}' for name, message in errors
+        ))
+
+
+@checks.register(checks.Tags.templates)
+def check_templates(app_configs, **kwargs):
+    return [
+        checks.Error(message, obj=name, id='core.E001')
+        for name, message in compile_all()
+    ]
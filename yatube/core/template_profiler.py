@@ -0,0 +1,106 @@
+"""Профилировщик отрисовки шаблонов.
+
+install() оборачивает Template._render и Node.render_annotated, и
+внутри profile() время отрисовки копится по именам шаблонов (включая
+подключённые через include и родителей из extends) и по тегам. Время
+включает вложенные шаблоны и теги, поэтому у include в цикле видно и
+число отрисовок, и их общую цену. Вне profile() обёртки сводятся к
+одной проверке threading.local.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.template.base import Node, Template, TextNode, TokenType
+
+_state = threading.local()
+_installed = False
+
+
+class Profile:
+    def __init__(self):
+        self.templates = {}
+        self.tags = {}
+        self.total = 0.0
+        self.depth = 0
+
+    @staticmethod
+    def _add(rows, name, seconds):
+        row = rows.setdefault(name, [0, 0.0])
+        row[0] += 1
+        row[1] += seconds
+
+    @staticmethod
+    def _rows(rows, limit):
+        ordered = sorted(rows.items(), key=lambda item: -item[1][1])
+        return [
+            {'name': name, 'count': count, 'ms': round(seconds * 1000, 2)}
+            for name, (count, seconds) in ordered[:limit]
+        ]
+
+    def summary(self, limit=10):
+        return {
+            'render_ms': round(self.total * 1000, 2),
+            'templates': self._rows(self.templates, limit),
+            'tags': self._rows(self.tags, limit),
+        }
+
+
+def tag_name(node):
+    token = getattr(node, 'token', None)
+    if token is None:
+        return type(node).__name__
+    if token.token_type == TokenType.VAR:
+        return '{{ }}'
+    return token.contents.split(maxsplit=1)[0]
+
+
+def install():
+    """Ставит обёртки один раз на процесс."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    render_template = Template._render
+    render_node = Node.render_annotated
+
+    def _render(self, context):
+        profile = getattr(_state, 'profile', None)
+        if profile is None:
+            return render_template(self, context)
+        profile.depth += 1
+        started = time.perf_counter()
+        try:
+            return render_template(self, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            profile.depth -= 1
+            profile._add(profile.templates,
+                         self.origin.template_name or self.name, elapsed)
+            if not profile.depth:
+                profile.total += elapsed
+
+    def render_annotated(self, context):
+        profile = getattr(_state, 'profile', None)
+        if profile is None or isinstance(self, TextNode):
+            return render_node(self, context)
+        started = time.perf_counter()
+        try:
+            return render_node(self, context)
+        finally:
+            profile._add(profile.tags, tag_name(self),
+                         time.perf_counter() - started)
+
+    Template._render = _render
+    Node.render_annotated = render_annotated
+
+
+@contextmanager
+def profile():
+    """Копит время отрисовки шаблонов текущего потока."""
+    result = Profile()
+    _state.profile = result
+    try:
+        yield result
+    finally:
+        _state.profile = None
@@ -0,0 +1,62 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from core import db_router, fragments
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        key = fragments.make_key(
+            name, [var.resolve(context) for var in self.vary_on]
+        )
+        prefetched = context.get('fragments')
+        if prefetched is not None and key in prefetched:
+            value = prefetched[key]
+        else:
+            value = cache.get(key)
+        fragments.record(name, value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            # Реплика может отставать от уже увеличенного поколения,
+            # поэтому отрисованное по ней живёт недолго.
+            timeout = (
+                None if db_router.reads_primary()
+                else settings.REPLICA_FRAGMENT_TIMEOUT
+            )
+            cache.set(key, value, timeout)
+        return value
+
+
+@register.tag('fragment')
+def do_fragment(parser, token):
+    """Кэширует содержимое без таймаута.
+
+    {% fragment 'post' post.id post.updated %} ... {% endfragment %}
+
+    Первый аргумент задаёт имя фрагмента для статистики, остальные
+    входят в ключ. Чтобы фрагмент устаревал при записи, среди них
+    передают версию поколений из core.fragments.version(). Если view
+    заранее выбрал фрагменты через core.fragments.prefetch() и положил
+    их в контекст как fragments, тег не ходит в кэш сам.
+    """
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 1 argument."
+        )
+    return FragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,15 @@
+class QueryBudgetMixin:
+    """Проверки для TestCase: view укладывается в объявленный бюджет."""
+
+    def assertWithinQueryBudget(self, response):
+        stats = response.wsgi_request.query_stats
+        if stats.budget is None:
+            self.fail(f'У {stats.view} не объявлен бюджет запросов')
+        if stats.over_budget:
+            repeated = '\n'.join(
+                f'{total} x {sql}' for sql, total in stats.duplicates.items()
+            )
+            self.fail(
+                f'{stats.view} сделал {stats.count} запросов '
+                f'при бюджете {stats.budget}\n{repeated}'
+            )
@@ -1,6 +1,29 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
 from http import HTTPStatus
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+
+from . import (db_router, fragments, jobs, page_cache, template_cache,
+               template_profiler)
+from .cache_backends import SQLiteCache
+from .db_router import ReplicaRouter
+from .models import Heartbeat, Job
+from .queries import QueryStats
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -9,3 +32,436 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, template)
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+    def test_stats_and_server_timing(self):
+        """Middleware считает запросы view и отдаёт Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        stats = response.wsgi_request.query_stats
+        self.assertEqual(stats.view, 'posts.views.index')
+        self.assertEqual(stats.budget, 4)
+        self.assertGreater(stats.count, 0)
+        self.assertIn(f'desc="{stats.count} queries"',
+                      response['Server-Timing'])
+
+    def test_stats_logged_at_debug(self):
+        """Строка статистики запроса в бюджете пишется с DEBUG."""
+        with self.assertLogs('core.queries', 'DEBUG') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertEqual([record.levelname for record in logs.records],
+                         ['DEBUG'])
+        self.assertIn('"view": "posts.views.index"', logs.output[0])
+
+    def test_duplicates_are_fingerprinted(self):
+        """Одинаковый SQL с разными параметрами считается дублем."""
+        stats = QueryStats()
+        sql = 'SELECT * FROM t WHERE id = %s'
+        for pk in (1, 2, 3):
+            stats(lambda *args: None, sql, (pk,), False, {})
+        stats(lambda *args: None, 'SELECT 1', (), False, {})
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.duplicates, {sql: 3})
+        stats.budget = 3
+        self.assertTrue(stats.over_budget)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_many(self):
+        """set_many и get_many работают пачкой и пропускают промахи."""
+        self.cache.set_many({'a': 'текст', 'b': [1, 2]})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']),
+            {'a': 'текст', 'b': [1, 2]},
+        )
+
+    def test_shared_between_instances(self):
+        """Записи видны другому экземпляру, открывшему тот же файл."""
+        self.cache.set('key', 'value')
+        self.assertEqual(SQLiteCache(self.path, {}).get('key'), 'value')
+
+    def test_add_and_incr(self):
+        """add не перезаписывает живой ключ, incr считает в хранилище."""
+        self.assertTrue(self.cache.add('counter', 1, None))
+        self.assertFalse(self.cache.add('counter', 10, None))
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired(self):
+        """Просроченный ключ не читается и уступает место add."""
+        self.cache.set('key', 'old', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+
+class FragmentPrefetchTest(TestCase):
+    def test_prefetch(self):
+        """prefetch отдаёт все ключи, у промахов значение None."""
+        cache.clear()
+        hit = fragments.make_key('post', [1, 'v'])
+        miss = fragments.make_key('post', [2, 'v'])
+        cache.set(hit, '<p>пост</p>', None)
+        self.assertEqual(
+            fragments.prefetch([('post', [1, 'v']), ('post', [2, 'v'])]),
+            {hit: '<p>пост</p>', miss: None},
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.addCleanup(db_router.pin)
+
+    def test_reads_go_to_replicas(self):
+        """Чтения в запросе без записей уходят на реплики."""
+        db_router.pin(False)
+        self.assertIn(self.router.db_for_read(Heartbeat), {
+            'replica1', 'replica2'
+        })
+        self.assertEqual(self.router.db_for_write(Heartbeat), 'default')
+        self.assertEqual(self.router.db_for_read(Heartbeat), 'default')
+
+    def test_pinned_outside_requests(self):
+        """Вне запроса и при закреплении чтения идут в default."""
+        self.assertEqual(self.router.db_for_read(Heartbeat), 'default')
+        db_router.pin(True)
+        self.assertEqual(self.router.db_for_read(Heartbeat), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_cookie_after_write(self):
+        """Запрос с записью закрепляет клиента за основной базой."""
+        user = User.objects.create_user(username='author')
+        self.client.force_login(user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('db_pin', response.cookies)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertEqual(response.cookies['db_pin']['max-age'], 5)
+
+
+class SQLiteBackendTest(TestCase):
+    def test_pragmas(self):
+        """Новое соединение получает PRAGMA бэкенда."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class AnonymousPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def test_public_headers_for_anonymous(self):
+        """Аноним получает публичный ответ с ETag и Last-Modified."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('ETag', response)
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date(self.post.updated.timestamp()),
+        )
+
+    def test_private_for_logged_in(self):
+        """Вошедшему пользователю страница отдаётся как private."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+    def test_not_modified(self):
+        """If-Modified-Since и If-None-Match дают 304 до новой записи."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('about:author'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                modified = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(modified.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+        url = reverse('posts:post_detail', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_edit_moves_last_modified(self):
+        """После правки поста If-Modified-Since не даёт 304 на ленты."""
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Post.objects.filter(id=self.post.id).update(
+            pub_date=hour_ago, updated=hour_ago
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+        ]
+        modified = {url: self.client.get(url)['Last-Modified'] for url in urls}
+        self.post.refresh_from_db()
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified[url]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_no_etag_from_replica(self):
+        """По данным реплики ETag не ставится, остаётся Last-Modified."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        fragments.flush()
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+
+    def test_hit_skips_view(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            .status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+
+    def test_not_for_logged_in(self):
+        """Вошедшим пользователям страницы не кэшируются."""
+        self.client.force_login(self.author)
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_purge_only_affected_pages(self):
+        """Новый пост сбрасывает только страницы своего автора и группы."""
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile', args=[self.author]),
+            'other': reverse('posts:profile', args=[self.other]),
+            'post': reverse('posts:post_detail', args=[self.post.id]),
+        }
+        for url in urls.values():
+            self.client.get(url)
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Второй пост')
+        for name, url in urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                cached = response.context is None
+                self.assertEqual(cached, name in ('other', 'post'))
+        Comment.objects.create(post=self.post, author=self.other,
+                               text='Комментарий')
+        self.assertIsNone(self.client.get(urls['index']).context)
+        self.assertIsNotNone(self.client.get(urls['post']).context)
+
+    def test_purge_on_renames(self):
+        """Переименования сбрасывают страницы поста и профиля автора."""
+        Comment.objects.create(post=self.post, author=self.other,
+                               text='Комментарий')
+        urls = [
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:profile', args=[self.author]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        self.other.username = 'commenter'
+        self.other.save()
+        self.assertContains(
+            self.client.get(urls[0]),
+            reverse('posts:profile', args=['commenter']),
+        )
+        self.group.slug = 'renamed'
+        self.group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.client.get(url),
+                    reverse('posts:group_list', args=['renamed']),
+                )
+
+    def test_purge_non_ascii_path(self):
+        """Профиль с кириллическим именем сбрасывается новым постом."""
+        author = User.objects.create_user(username='Иван')
+        url = reverse('posts:profile', args=[author.username])
+        self.client.get(url)
+        Post.objects.create(author=author, text='Новый пост Ивана')
+        self.assertContains(self.client.get(url), 'Новый пост Ивана')
+
+    def test_stats(self):
+        """Попадания, промахи и сбросы видны в статистике."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Ещё пост')
+        row = page_cache.stats()['pages']['page:index']
+        self.assertEqual((row['hits'], row['misses']), (1, 1))
+        self.assertGreater(page_cache.stats()['purges'], 0)
+
+
+calls = []
+
+
+@jobs.task('core.tests.record')
+def record_call(value):
+    calls.append(value)
+
+
+@jobs.task('core.tests.broken', max_attempts=2)
+def broken_task():
+    raise RuntimeError('Сломано')
+
+
+def drain():
+    """Выполняет все задачи со сроком в текущем потоке."""
+    while True:
+        job = jobs.claim()
+        if job is None:
+            return
+        jobs.run(job)
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_eager(self):
+        """При JOBS_EAGER задача выполняется сразу, без записи в базу."""
+        jobs.enqueue('core.tests.record', 1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_EAGER=False)
+    def test_queued_with_key(self):
+        """Задача с ключом ставится в очередь один раз."""
+        jobs.enqueue('core.tests.record', 1, key='once')
+        jobs.enqueue('core.tests.record', 2, key='once')
+        jobs.enqueue('core.tests.record', 3)
+        self.assertEqual(calls, [])
+        drain()
+        self.assertEqual(calls, [1, 3])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+        jobs.enqueue('core.tests.record', 4, key='once')
+        drain()
+        self.assertEqual(calls, [1, 3])
+
+    @override_settings(JOBS_EAGER=False, JOB_BACKOFF_SECONDS=10)
+    def test_retry_with_backoff(self):
+        """Упавшая задача откладывается, а после всех попыток — failed."""
+        jobs.enqueue('core.tests.broken')
+        drain()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('Сломано', job.last_error)
+        Job.objects.update(run_at=timezone.now())
+        drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    @override_settings(JOBS_EAGER=False)
+    def test_expired_lease(self):
+        """Задача воркера, не уложившегося в срок, возвращается в очередь."""
+        jobs.enqueue('core.tests.record', 1)
+        job = jobs.claim()
+        Job.objects.filter(id=job.id).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertIsNone(jobs.claim())
+        self.assertEqual(jobs.release_expired(), 1)
+        drain()
+        self.assertEqual(calls, [1])
+
+    @override_settings(JOBS_EAGER=False)
+    def test_feed_fan_out_is_deferred(self):
+        """Раздача поста по лентам ждёт воркера."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.create(author=author, text='Пост')
+        self.assertFalse(FeedEntry.objects.exists())
+        drain()
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 1)
+
+
+class TemplateCacheTest(TestCase):
+    def test_project_templates_compile(self):
+        """Все шаблоны проекта компилируются без ошибок."""
+        self.assertEqual(template_cache.compile_all(), [])
+
+    def test_errors_are_reported(self):
+        """Синтаксическая ошибка и include несуществующего шаблона видны."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'broken.html'), 'w') as file:
+            file.write('{% if %}')
+        with open(os.path.join(directory, 'missing.html'), 'w') as file:
+            file.write('{% include "nowhere.html" %}')
+        templates = [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [directory],
+        }]
+        with override_settings(TEMPLATES=templates):
+            errors = dict(template_cache.compile_all())
+            self.assertEqual(set(errors), {'broken.html', 'missing.html'})
+            self.assertEqual(len(checks.run_checks(
+                tags=[checks.Tags.templates]
+            )), 2)
+
+
+class TemplateProfilerTest(TestCase):
+    def test_include_in_loop(self):
+        """Профиль показывает каждую отрисовку поста в ленте."""
+        author = User.objects.create_user(username='author')
+        for number in range(3):
+            Post.objects.create(author=author, text=f'Пост {number}')
+        cache.clear()
+        template_profiler.install()
+        with override_settings(PAGE_CACHE=False), \
+                template_profiler.profile() as profile:
+            self.client.get(reverse('posts:index'))
+        summary = profile.summary(limit=50)
+        templates = {row['name']: row for row in summary['templates']}
+        self.assertEqual(templates['includes/post.html']['count'], 3)
+        self.assertIn('include', [row['name'] for row in summary['tags']])
+        self.assertGreater(summary['render_ms'], 0)
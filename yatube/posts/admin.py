@@ -1,18 +1,43 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post, Comment
 
 
-class CommentAdmin(admin.ModelAdmin):
+class IndexSearchMixin:
+    """Поиск в админке через полнотекстовый индекс вместо LIKE."""
+
+    search_kind = None
+    search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        stems = [
+            search.stem(token) for token in search.tokens(search_term)
+        ]
+        if not stems:
+            # В запросе одни знаки препинания: искать нечего.
+            return queryset.none(), False
+        rows = search.get_backend().match(
+            stems, None, self.search_limit, kind=self.search_kind
+        )
+        ids = [search.split_rowid(position)[1] for _, position in rows]
+        return queryset.filter(pk__in=ids), False
+
+
+class CommentAdmin(IndexSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'author', 'created')
     search_fields = ('text',)
+    search_kind = search.COMMENT
     empty_value_display = '-пусто-'
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(IndexSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     list_editable = ('group',)
     search_fields = ('text',)
+    search_kind = search.POST
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
@@ -0,0 +1,314 @@
+"""Нагрузочные замеры страниц posts.
+
+seed() наполняет базу синтетическими данными: тексты даёт Faker,
+популярность авторов распределена по Ципфу, поэтому у немногих
+авторов почти все подписчики и посты, как на живом сайте. run()
+гоняет GET-запросы к страницам через WSGI-приложение проекта из
+нескольких потоков и собирает перцентили задержки, число SQL-запросов
+(из заголовка Server-Timing) и память процесса. Кэш целых страниц на
+время замера выключен: иначе анонимные страницы отдавались бы из него
+и замер показывал бы попадания в кэш, а не работу view. Итог
+сохраняется в JSON, чтобы сравнивать замеры между коммитами.
+"""
+import io
+import random
+import re
+import resource
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from core import fragments
+
+from . import counters, feed, search, threads
+from .models import Comment, Follow, Group, Post
+from .transfer import manual_dates
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+TEXTS = 1000
+SERVER_TIMING = re.compile(r'desc="(\d+) queries"')
+
+
+def zipf_weights(size, exponent=1.1):
+    """Накопленные веса рангов 1..size с убыванием 1 / rank**exponent."""
+    total = 0.0
+    weights = []
+    for rank in range(1, size + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+def _bulk(model, objects):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, BATCH_SIZE))
+        if not batch:
+            return
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def seed(users, posts, groups, follows, comments, seed=0):
+    """Создаёт синтетический набор данных и пересчитывает производные."""
+    rnd = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    texts = [fake.paragraph(nb_sentences=5) for _ in range(TEXTS)]
+    prefix = f'bench{seed}-'
+
+    _bulk(User, (
+        User(
+            username=f'{prefix}{n}',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            password='!',
+        )
+        for n in range(users)
+    ))
+    user_ids = list(
+        User.objects.filter(username__startswith=prefix)
+        .order_by('id').values_list('id', flat=True)
+    )
+    _bulk(Group, (
+        Group(
+            title=fake.catch_phrase()[:200],
+            slug=f'{prefix}{n}',
+            description=rnd.choice(texts),
+        )
+        for n in range(groups)
+    ))
+    group_ids = list(
+        Group.objects.filter(slug__startswith=prefix)
+        .values_list('id', flat=True)
+    ) + [None]
+
+    # Популярность по Ципфу: первые пользователи списка пишут больше
+    # всех и собирают больше всех подписчиков.
+    weights = zipf_weights(len(user_ids))
+    now = timezone.now()
+    pub_date = Post._meta.get_field('pub_date')
+    updated = Post._meta.get_field('updated')
+    with manual_dates(pub_date, updated):
+        def make_post():
+            moment = now - timedelta(seconds=rnd.randrange(365 * 86400))
+            return Post(
+                author_id=rnd.choices(user_ids, cum_weights=weights)[0],
+                group_id=rnd.choice(group_ids),
+                text=rnd.choice(texts),
+                pub_date=moment,
+                updated=moment,
+            )
+        _bulk(Post, (make_post() for _ in range(posts)))
+
+    def make_follows():
+        # Повторные пары bulk_create отбросил бы молча, поэтому они
+        # отсеиваются здесь и подписок создаётся ровно столько, сколько
+        # просили (но не больше, чем возможных пар).
+        pairs = set()
+        total = min(follows, len(user_ids) * (len(user_ids) - 1))
+        while len(pairs) < total:
+            user_id = rnd.choice(user_ids)
+            author_id = rnd.choices(user_ids, cum_weights=weights)[0]
+            if user_id != author_id and (user_id, author_id) not in pairs:
+                pairs.add((user_id, author_id))
+                yield Follow(user_id=user_id, author_id=author_id)
+    _bulk(Follow, make_follows())
+
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    if post_ids:
+        _bulk(Comment, (
+            Comment(
+                post_id=rnd.choice(post_ids),
+                author_id=rnd.choice(user_ids),
+                text=rnd.choice(texts)[:200],
+            )
+            for _ in range(comments)
+        ))
+        threads.fill_root_paths()
+
+    # bulk_create не вызывает сигналы, поэтому производные данные
+    # пересчитываются целиком.
+    counters.rebuild_counters()
+    search.get_backend().rebuild()
+    feed.rebuild_all_feeds()
+    fragments.bump_all()
+
+
+def dataset():
+    """Объём данных, на которых делался замер."""
+    return {
+        'users': User.objects.count(),
+        'posts': Post.objects.count(),
+        'groups': Group.objects.count(),
+        'follows': Follow.objects.count(),
+        'comments': Comment.objects.count(),
+    }
+
+
+def sample_urls():
+    """Адреса страниц posts на реальных данных: [(имя, url, читатель)]."""
+    urls = [('index', reverse('posts:index'), None)]
+    post = (
+        Post.objects.filter(group__isnull=False)
+        .select_related('author', 'group').first()
+        or Post.objects.select_related('author').first()
+    )
+    if post is None:
+        return urls
+    urls.append(('profile', reverse('posts:profile', args=[post.author]),
+                 None))
+    urls.append(('post_detail',
+                 reverse('posts:post_detail', args=[post.id]), None))
+    if post.group:
+        urls.append(('group_posts',
+                     reverse('posts:group_list', args=[post.group.slug]),
+                     None))
+    follow = Follow.objects.select_related('user').order_by('-id').first()
+    reader = follow.user if follow else post.author
+    urls.append(('follow_index', reverse('posts:follow_index'), reader))
+    return urls
+
+
+def session_cookie(user):
+    if user is None:
+        return ''
+    client = Client()
+    client.force_login(user)
+    return '; '.join(
+        f'{name}={morsel.value}' for name, morsel in client.cookies.items()
+    )
+
+
+def environ(path, cookie):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def percentile(samples, point):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100)[point - 1]
+
+
+def rss_mb():
+    """Текущая память процесса по /proc, либо пиковая из getrusage."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(requests, clients):
+    """Замеряет каждую страницу и возвращает итог для JSON."""
+    result = {
+        'commit': commit(),
+        'created': timezone.now().isoformat(),
+        'clients': clients,
+        'requests': requests,
+        'dataset': dataset(),
+        'urls': {},
+    }
+    with override_settings(PAGE_CACHE=False):
+        for name, path, user in sample_urls():
+            result['urls'][name] = measure(path, user, requests, clients)
+    result['rss_mb'] = round(rss_mb(), 1)
+    result['max_rss_mb'] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+    return result
+
+
+def measure(path, user, requests, clients):
+    """Перцентили задержки и число запросов одной страницы."""
+    from yatube.wsgi import application
+    cookie = session_cookie(user)
+
+    def hit(_):
+        meta = {}
+
+        def start_response(status, headers):
+            meta['status'] = int(status.split()[0])
+            meta['headers'] = dict(headers)
+        started = time.perf_counter()
+        body = application(environ(path, cookie), start_response)
+        b''.join(body)
+        body.close()
+        elapsed = (time.perf_counter() - started) * 1000
+        match = SERVER_TIMING.search(
+            meta['headers'].get('Server-Timing', '')
+        )
+        return elapsed, int(match.group(1)) if match else 0, meta
+
+    if clients > 1:
+        with ThreadPoolExecutor(clients) as pool:
+            rows = list(pool.map(hit, range(requests)))
+    else:
+        rows = [hit(n) for n in range(requests)]
+    latencies = [elapsed for elapsed, _, _ in rows]
+    return {
+        'path': path,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'queries': max(queries for _, queries, _ in rows),
+        'errors': sum(meta['status'] >= 400 for _, _, meta in rows),
+    }
+
+
+def compare(old, new):
+    """Строки сравнения p95 двух замеров по общим страницам."""
+    lines = []
+    for name, row in new['urls'].items():
+        before = old['urls'].get(name)
+        if before is None:
+            continue
+        delta = row['p95_ms'] - before['p95_ms']
+        ratio = delta / before['p95_ms'] if before['p95_ms'] else 0.0
+        lines.append(
+            f'{name:<14} p95 {before["p95_ms"]:>8.2f} → {row["p95_ms"]:>8.2f} '
+            f'мс ({ratio:+.0%}), запросов {before["queries"]} → '
+            f'{row["queries"]}'
+        )
+    return lines
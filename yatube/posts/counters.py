@@ -0,0 +1,81 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным UPDATE ... SET n = n + 1 из сигналов
+моделей, поэтому шаблонам и паджинатору не нужен COUNT(*). Если
+значения разошлись с данными, их пересобирает rebuild_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def _shift(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def shift_user(user_id, field, delta):
+    """Сдвигает счётчик пользователя, при отсутствии строки считает его."""
+    if user_id is None:
+        return
+    updated = _shift(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        rebuild_user_stats(User.objects.filter(id=user_id))
+
+
+def shift_group(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(id=group_id), 'posts_count', delta)
+
+
+def shift_post(post_id, delta):
+    _shift(Post.objects.filter(id=post_id), 'comments_count', delta)
+
+
+def get_stats(user):
+    """Счётчики пользователя; строка создаётся, если её ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild_user_stats(User.objects.filter(id=user.id))
+        return UserStats.objects.get(user=user)
+
+
+def _count(model, field):
+    """Подзапрос с числом строк model, у которых field равен внешнему id."""
+    counted = (
+        model.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted), 0)
+
+
+def rebuild_user_stats(users=None):
+    users = User.objects.all() if users is None else users
+    users = users.annotate(
+        n_posts=_count(Post, 'author'),
+        n_followers=_count(Follow, 'author'),
+        n_following=_count(Follow, 'user'),
+    ).values_list('id', 'n_posts', 'n_followers', 'n_following')
+    for user_id, posts, followers, following in users.iterator():
+        UserStats.objects.update_or_create(user_id=user_id, defaults={
+            'posts_count': posts,
+            'followers_count': followers,
+            'following_count': following,
+        })
+
+
+def rebuild_counters():
+    """Пересчитывает все счётчики по текущим данным."""
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+    rebuild_user_stats()
@@ -0,0 +1,155 @@
+"""Лента подписок с раздачей постов при записи (fan-out-on-write).
+
+Каждый новый пост раскладывается в FeedEntry всем подписчикам автора,
+а при подписке в ленту докладываются старые посты автора. Лента затем
+читается по индексу (user, pub_date) без соединения Follow и Post.
+
+Авторы, у которых подписчиков больше settings.FEED_FANOUT_LIMIT,
+раздачей не занимаются: их посты подтягиваются в ленту при чтении.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from .models import FeedEntry, Follow, Post, UserStats
+from .paginator import NEXT, CursorPaginator, encode_cursor
+
+BATCH_SIZE = 1000
+
+
+def is_pull_author(author_id):
+    """Слишком много подписчиков, чтобы раздавать каждый пост."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def pull_author_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    return list(
+        Follow.objects
+        .filter(
+            user=user,
+            author__stats__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        )
+        .values_list('author_id', flat=True)
+    )
+
+
+def _bulk_insert(entries):
+    # bulk_create сам делает список из объектов, поэтому режем поток
+    # на пачки заранее, чтобы память не росла с числом подписчиков.
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты подписчиков автора.
+
+    Отдаёт id подписчиков, чьи ленты изменились. Их не больше
+    FEED_FANOUT_LIMIT: у авторов популярнее раздачи нет.
+    """
+    if is_pull_author(post.author_id):
+        return []
+    followers = list(
+        Follow.objects
+        .filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers
+    )
+    return followers
+
+
+def backfill_follow(follow):
+    """Докладывает в ленту подписчика уже опубликованные посты автора."""
+    if is_pull_author(follow.author_id):
+        return
+    posts = (
+        Post.objects
+        .filter(author_id=follow.author_id)
+        .values_list('id', 'pub_date')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _bulk_insert(
+        FeedEntry(user_id=follow.user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+
+
+def drop_follow(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def rebuild_feed(user):
+    """Собирает ленту пользователя заново по его подпискам."""
+    FeedEntry.objects.filter(user=user).delete()
+    for follow in Follow.objects.filter(user=user):
+        backfill_follow(follow)
+
+
+def rebuild_all_feeds():
+    """Собирает все ленты заново одним INSERT ... SELECT в базе."""
+    FeedEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedEntry._meta.db_table} '
+            f'(user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            f'LEFT JOIN {UserStats._meta.db_table} s '
+            f'ON s.user_id = f.author_id '
+            f'WHERE COALESCE(s.followers_count, 0) <= %s',
+            [settings.FEED_FANOUT_LIMIT],
+        )
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорный паджинатор ленты подписок.
+
+    Разложенные записи читаются из FeedEntry, а посты авторов с большим
+    числом подписчиков добираются отдельным запросом и сливаются по
+    (pub_date, id). Ключи FeedEntry совпадают с ключами Post, поэтому
+    курсоры у обоих источников общие.
+    """
+
+    def __init__(self, user, per_page):
+        entries = FeedEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        )
+        super().__init__(entries, per_page, keys=('pub_date', 'post_id'))
+        pulled = pull_author_ids(user)
+        self.pulled = None
+        if pulled:
+            self.pulled = Post.objects.filter(
+                author_id__in=pulled
+            ).select_related('author', 'group')
+
+    def _make_cursor(self, direction, obj):
+        return encode_cursor(direction, obj.pub_date, obj.id)
+
+    def _rows(self, direction, position):
+        posts = [entry.post for entry in super()._rows(direction, position)]
+        if self.pulled is None:
+            return posts
+        posts += self._fetch(
+            self.pulled, ('pub_date', 'id'), direction, position
+        )
+        unique = {post.id: post for post in posts}.values()
+        return sorted(
+            unique,
+            key=lambda post: (post.pub_date, post.id),
+            reverse=direction == NEXT,
+        )[:self.per_page + 1]
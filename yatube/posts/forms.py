@@ -1,5 +1,10 @@
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -8,6 +13,48 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, image_too_large=False, **kwargs):
+        """image_too_large — загрузку прервали по размеру файла.
+
+        Такой файл до формы не доходит (uploads.too_large), а файл
+        больше лимита, переданный в обход обработчика загрузки,
+        отбрасывается здесь же.
+        """
+        super().__init__(*args, **kwargs)
+        image = self.files.get('image')
+        self.image_too_large = image_too_large or bool(image) and (
+            image.size > settings.POST_IMAGE_MAX_BYTES
+        )
+        if self.image_too_large and image:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise ValidationError(
+                'Файл больше %s.'
+                % filesizeformat(settings.POST_IMAGE_MAX_BYTES),
+                code='file_too_large',
+            )
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        fmt, (width, height) = uploads.inspect(image)
+        if fmt not in uploads.ALLOWED_FORMATS:
+            raise ValidationError(
+                'Поддерживаются только JPEG, PNG, GIF и WebP.',
+                code='invalid_format',
+            )
+        if width * height > uploads.pixel_limit(fmt):
+            raise ValidationError(
+                'Слишком большая картинка: %(width)s×%(height)s.',
+                code='too_many_pixels',
+                params={'width': width, 'height': height},
+            )
+        if uploads.needs_rewrite(image):
+            image = uploads.rewrite(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta():
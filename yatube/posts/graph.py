@@ -0,0 +1,188 @@
+"""Граф подписок: списки, взаимные подписки и рекомендации.
+
+Подписчики и подписки листаются курсором по (created, id) таблицы
+Follow. Статус подписки на всех авторов страницы проверяется одним
+запросом (FollowStatus и тег follow_button).
+
+Рекомендации «кого почитать» — друзья друзей: авторы, на которых
+подписаны авторы из подписок пользователя, с весом по числу таких
+путей. Если Follow — разреженная матрица смежности A, то веса —
+строки произведения A·A без уже известных подписок. build_suggestions
+считает это произведение в базе пачками пользователей и кладёт top-N
+в кэш, а страницы только читают готовый список и никогда его не
+считают.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from .models import Follow
+from .paginator import CursorPaginator
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def followers(user, per_page=None, count=None):
+    """Паджинатор подписок на user, новые подписчики первыми."""
+    return CursorPaginator(
+        Follow.objects.filter(author=user).select_related('user')
+        .order_by('-created', '-id'),
+        per_page or settings.PAGIN, keys=('created', 'id'), count=count,
+    )
+
+
+def following(user, per_page=None, count=None):
+    """Паджинатор подписок user, новые подписки первыми."""
+    return CursorPaginator(
+        Follow.objects.filter(user=user).select_related('author')
+        .order_by('-created', '-id'),
+        per_page or settings.PAGIN, keys=('created', 'id'), count=count,
+    )
+
+
+def is_mutual(user, other):
+    """Подписаны ли user и other друг на друга."""
+    if not user.is_authenticated or user.id == other.id:
+        return False
+    return Follow.objects.filter(
+        Q(user_id=user.id, author_id=other.id)
+        | Q(user_id=other.id, author_id=user.id)
+    ).count() == 2
+
+
+def mutual_ids(user, ids):
+    """id из ids, с которыми у user взаимная подписка, одним запросом."""
+    if not user.is_authenticated or not ids:
+        return set()
+    return set(
+        Follow.objects.filter(
+            user_id=user.id,
+            author_id__in=ids,
+            author__follower__author_id=user.id,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def followed_ids(user, ids):
+    """id из ids, на которых подписан user, одним запросом."""
+    if not user.is_authenticated or not ids:
+        return set()
+    return set(
+        Follow.objects.filter(user_id=user.id, author_id__in=ids)
+        .values_list('author_id', flat=True)
+    )
+
+
+class FollowStatus:
+    """Подписки user на набор авторов, выбранные одним запросом.
+
+    Запрос делается при первой проверке, поэтому статус, положенный
+    в контекст, ничего не стоит, если фрагмент ленты взят из кэша.
+    """
+
+    def __init__(self, user, ids):
+        self.user = user
+        self.ids = set(ids)
+        self._followed = None
+
+    def can_follow(self, author_id):
+        return self.user.is_authenticated and author_id != self.user.id
+
+    def is_following(self, author_id):
+        if self._followed is None:
+            self._followed = followed_ids(self.user, self.ids)
+        return author_id in self._followed
+
+
+def follow_status_context(user, posts):
+    """Контекст для тега follow_button по авторам постов страницы."""
+    ids = {post.author_id for post in posts}
+    return {'follow_status': FollowStatus(user, ids)}
+
+
+def suggestions_key(user_id):
+    return f'suggestions:{user_id}'
+
+
+def suggestions(user):
+    """Рекомендованные авторы из кэша; без готового списка — пусто.
+
+    Авторы, на которых пользователь подписался после расчёта,
+    отбрасываются тем же запросом, что читает пользователей.
+    """
+    if not user.is_authenticated:
+        return []
+    ids = cache.get(suggestions_key(user.id))
+    if not ids:
+        return []
+    found = User.objects.filter(id__in=ids).exclude(
+        following__user_id=user.id
+    ).in_bulk()
+    return [found[pk] for pk in ids if pk in found]
+
+
+def friends_of_friends(user_ids):
+    """Строки A·A для пачки пользователей: {user_id: {author_id: вес}}."""
+    table = Follow._meta.db_table
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    scores = defaultdict(dict)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT f1.user_id, f2.author_id, COUNT(*) '
+            f'FROM {table} f1 '
+            f'JOIN {table} f2 ON f2.user_id = f1.author_id '
+            f'WHERE f1.user_id IN ({placeholders}) '
+            f'AND f2.author_id <> f1.user_id '
+            f'AND NOT EXISTS (SELECT 1 FROM {table} d '
+            f'WHERE d.user_id = f1.user_id AND d.author_id = f2.author_id) '
+            f'GROUP BY f1.user_id, f2.author_id',
+            list(user_ids),
+        )
+        for user_id, author_id, score in cursor.fetchall():
+            scores[user_id][author_id] = score
+    return scores
+
+
+def top(scores, limit):
+    """limit авторов с наибольшим весом, при равенстве — меньший id."""
+    best = heapq.nsmallest(
+        limit, scores.items(), key=lambda item: (-item[1], item[0])
+    )
+    return [author_id for author_id, _ in best]
+
+
+def build_suggestions(user_ids=None, batch_size=BATCH_SIZE, limit=None):
+    """Пересчитывает рекомендации пачками; отдаёт число пользователей.
+
+    Пользователи без рекомендаций тоже получают запись в кэше, чтобы
+    устаревший список не пережил отписку от всех авторов.
+    """
+    limit = limit or settings.SUGGESTIONS_LIMIT
+    if user_ids is None:
+        user_ids = (
+            User.objects.order_by('id').values_list('id', flat=True)
+            .iterator(chunk_size=batch_size)
+        )
+    user_ids = iter(user_ids)
+    done = 0
+    while True:
+        batch = list(islice(user_ids, batch_size))
+        if not batch:
+            return done
+        scores = friends_of_friends(batch)
+        cache.set_many(
+            {
+                suggestions_key(user_id): top(scores.get(user_id, {}), limit)
+                for user_id in batch
+            },
+            settings.SUGGESTIONS_TIMEOUT,
+        )
+        done += len(batch)
@@ -0,0 +1,55 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку страниц posts через WSGI-приложение и '
+        'сохраняет перцентили, число запросов и память в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов к каждой странице'
+        )
+        parser.add_argument(
+            '--clients', type=int, default=8,
+            help='Параллельных клиентов'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для результата (по умолчанию benchmarks/<коммит>.json)'
+        )
+        parser.add_argument(
+            '--compare', help='JSON прошлого замера для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        result = benchmark.run(options['requests'], options['clients'])
+        for name, row in result['urls'].items():
+            self.stdout.write(
+                f'{name:<14} p50 {row["p50_ms"]:>8.2f} '
+                f'p95 {row["p95_ms"]:>8.2f} p99 {row["p99_ms"]:>8.2f} мс, '
+                f'запросов {row["queries"]}, ошибок {row["errors"]}'
+            )
+        self.stdout.write(
+            f'RSS {result["rss_mb"]} МБ, пик {result["max_rss_mb"]} МБ'
+        )
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks',
+            f'{result["commit"] or "local"}.json',
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результат: {output}')
+        if options['compare']:
+            with open(options['compare']) as file:
+                for line in benchmark.compare(json.load(file), result):
+                    self.stdout.write(line)
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.graph import BATCH_SIZE, build_suggestions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «кого почитать» по графу подписок '
+        'и кладёт их в кэш. Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи рекомендации нужно пересчитать '
+                 '(по умолчанию все)'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(
+                User.objects.filter(username__in=options['usernames'])
+                .values_list('id', flat=True)
+            )
+        done = build_suggestions(
+            user_ids, batch_size=options['batch_size'],
+            limit=options['limit'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Рекомендации пересчитаны: {done}')
+        )
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils.http import urlencode
+
+from posts.models import PATH_SEGMENT, Comment, Follow, Post
+
+User = get_user_model()
+
+# Признаки плохого плана в выводе EXPLAIN QUERY PLAN у SQLite.
+TEMP_SORT = 'USE TEMP B-TREE'
+# Проход FTS5 по условию MATCH (idxStr начинается с M): читает только
+# совпадения, а их сортировку по bm25 индекс дать не может.
+FTS_MATCH = 'VIRTUAL TABLE INDEX 0:M'
+
+
+def is_full_scan(detail):
+    """SCAN без индекса означает полный проход по таблице."""
+    return (
+        detail.startswith('SCAN') and 'USING' not in detail
+        and FTS_MATCH not in detail
+    )
+
+
+def bad_steps(plan):
+    """Шаги плана с полным проходом по таблице или лишней сортировкой."""
+    ranked = any(FTS_MATCH in step for step in plan)
+    return [
+        step for step in plan
+        if is_full_scan(step) or (TEMP_SORT in step and not ranked)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет GET-запросы к страницам posts (ленты, пост, ветки '
+        'комментариев, поиск, популярное, подписчики), снимает EXPLAIN QUERY '
+        'PLAN для каждого SQL-запроса и отмечает полные проходы по '
+        'таблицам и сортировки во временном B-дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найден плохой план'
+        )
+
+    def sample_urls(self):
+        """Адреса страниц posts на реальных данных базы."""
+        anonymous = AnonymousUser()
+        urls = [
+            (reverse('posts:index'), anonymous),
+            (reverse('posts:trending'), anonymous),
+        ]
+        post = Post.objects.select_related('author', 'group').first()
+        if post is None:
+            return urls
+        urls.append((reverse('posts:profile', args=[post.author]), anonymous))
+        urls.append((reverse('posts:post_detail', args=[post.id]), anonymous))
+        if post.group:
+            urls.append(
+                (reverse('posts:group_list', args=[post.group.slug]),
+                 anonymous)
+            )
+        word = next((w for w in post.text.split() if w.isalpha()), None)
+        if word:
+            urls.append((
+                f'{reverse("posts:search")}?{urlencode({"q": word})}',
+                anonymous
+            ))
+        # Ветки комментариев: страница корней и догрузка ответов.
+        reply = Comment.objects.filter(parent__isnull=False).first()
+        commented = reply.post_id if reply else post.id
+        urls.append(
+            (reverse('posts:comments', args=[commented]), anonymous)
+        )
+        if reply:
+            root = int(reply.path[:PATH_SEGMENT])
+            urls.append((
+                f'{reverse("posts:comments", args=[commented])}'
+                f'?root={root}&after={reply.path}', anonymous
+            ))
+        follow = Follow.objects.select_related('user', 'author').first()
+        reader = follow.user if follow else post.author
+        author = follow.author if follow else post.author
+        urls.append((reverse('posts:follow_index'), reader))
+        urls.append((reverse('posts:followers', args=[author]), anonymous))
+        urls.append((reverse('posts:following', args=[reader]), anonymous))
+        return urls
+
+    def capture(self, url, user):
+        request = RequestFactory().get(url)
+        request.user = user
+        match = resolve(request.path)
+        with CaptureQueriesContext(connection) as captured:
+            match.func(request, *match.args, **match.kwargs)
+        return [query['sql'] for query in captured.captured_queries]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только у SQLite')
+        problems = 0
+        for url, user in self.sample_urls():
+            self.stdout.write(self.style.MIGRATE_HEADING(url))
+            seen = set()
+            for sql in self.capture(url, user):
+                if not sql.startswith('SELECT') or sql in seen:
+                    continue
+                seen.add(sql)
+                plan = self.explain(sql)
+                bad = bad_steps(plan)
+                problems += bool(bad)
+                style = self.style.WARNING if bad else self.style.SUCCESS
+                self.stdout.write(style(('ПЛОХО ' if bad else 'OK    ') + sql))
+                for step in plan:
+                    self.stdout.write(f'      {step}')
+        if problems and options['strict']:
+            raise CommandError(f'Запросов с плохим планом: {problems}')
+        self.stdout.write(f'Запросов с плохим планом: {problems}')
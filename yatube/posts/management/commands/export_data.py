@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии или подписки в NDJSON или '
+        'CSV. С --resume дописывает файл после последнего id в нём.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(transfer.FIELDS))
+        parser.add_argument(
+            'output', help='Файл выгрузки или - для stdout'
+        )
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить прерванную выгрузку в тот же файл'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output']
+        fmt = options['format'] or transfer.guess_format(path)
+        after_id = None
+        if options['resume'] and path != '-':
+            after_id = transfer.resume_point(path, fmt)
+        started = time.monotonic()
+        written = 0
+        file = sys.stdout if path == '-' else open(
+            path, 'a' if after_id is not None else 'w',
+            newline='', encoding='utf-8',
+        )
+        try:
+            for written in transfer.export_rows(
+                options['kind'], file, fmt, after_id=after_id,
+                chunk_size=options['chunk_size'],
+                header=after_id is None,
+            ):
+                self.progress(written, started)
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.progress(written, started)
+
+    def progress(self, done, started):
+        rate = done / max(time.monotonic() - started, 1e-6)
+        self.stderr.write(f'Выгружено {done} строк, {rate:.0f} строк/с')
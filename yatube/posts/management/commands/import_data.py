@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии или подписки из NDJSON или '
+        'CSV пачками bulk_create. Прерванная загрузка продолжается с '
+        'места остановки; счётчики, индекс и ленты пересчитываются в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(transfer.FIELDS))
+        parser.add_argument('input', help='Файл NDJSON или CSV')
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с первой строки, не глядя на файл прогресса'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать производные данные (например, если '
+                 'следом загружаются другие файлы)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['input']
+        fmt = options['format'] or transfer.guess_format(path)
+        started = time.monotonic()
+        done = 0
+        for done in transfer.import_rows(
+            options['kind'], path, fmt,
+            batch_size=options['batch_size'],
+            resume=not options['restart'],
+        ):
+            rate = done / max(time.monotonic() - started, 1e-6)
+            self.stderr.write(f'Загружено {done} строк, {rate:.0f} строк/с')
+        # Файл загружен до конца, прогресс больше не нужен.
+        if os.path.exists(transfer.progress_path(path)):
+            os.remove(transfer.progress_path(path))
+        if not options['no_rebuild']:
+            transfer.finish_import([options['kind']])
+        self.stdout.write(self.style.SUCCESS(f'Загружено строк: {done}'))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feed import rebuild_all_feeds, rebuild_feed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблицы Follow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты нужно пересобрать (по умолчанию все)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['usernames']:
+            with transaction.atomic():
+                rebuild_all_feeds()
+            self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны'))
+            return
+        users = User.objects.filter(username__in=options['usernames'])
+        for user in users.iterator():
+            with transaction.atomic():
+                rebuild_feed(user)
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, постами, подписками '
+        'и комментариями для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора; один и тот же seed даёт те же данные'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            benchmark.seed(
+                users=options['users'],
+                posts=options['posts'],
+                groups=options['groups'],
+                follows=options['follows'],
+                comments=options['comments'],
+                seed=options['seed'],
+            )
+        counts = ', '.join(
+            f'{name} {total}' for name, total in benchmark.dataset().items()
+        )
+        self.stdout.write(self.style.SUCCESS(f'В базе: {counts}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Показывает очередь и время работы пула миниатюр.'
+
+    def handle(self, *args, **options):
+        row = thumbnails.stats()
+        self.stdout.write(
+            f'в очереди {row["queued"]} готово {row["done"]} '
+            f'пропущено {row["skipped"]} ошибок {row["failed"]}'
+        )
+        self.stdout.write(
+            f'среднее {row["avg_ms"]:.0f} мс максимум {row["max_ms"]} мс'
+        )
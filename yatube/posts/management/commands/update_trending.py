@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.tasks import schedule_trending
+from posts.trending import fold
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит накопленные события в оценки популярного и '
+        'публикует списки. С --schedule ставит в очередь core.jobs '
+        'задачу, которая дальше повторяет пересчёт сама.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='store_true')
+
+    def handle(self, *args, **options):
+        done = fold()
+        self.stdout.write(
+            self.style.SUCCESS(f'Оценок пересчитано: {done}')
+        )
+        if options['schedule']:
+            schedule_trending()
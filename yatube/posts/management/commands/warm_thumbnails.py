@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Делает миниатюры картинок, которых ещё нет, например для постов, '
+        'загруженных до появления фонового пула.'
+    )
+
+    def handle(self, *args, **options):
+        # Пост без списка вариантов шаблон показывает заглушкой.
+        names = (
+            Post.objects.exclude(image='').filter(image_variants='')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        made = 0
+        for name in names.iterator():
+            made += thumbnails.render(name) is not None
+        self.stdout.write(f'Сделано миниатюр: {made}')
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from posts.stemmer import stems
+
+
+def create_index(apps, schema_editor):
+    # FTS5 есть только у SQLite; на других базах работает LikeBackend.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        "terms, tokenize = 'unicode61 remove_diacritics 0')"
+    )
+    rows = [
+        (pk * 2, stems(text))
+        for pk, text in Post.objects.values_list('id', 'text').iterator()
+    ] + [
+        (pk * 2 + 1, stems(text))
+        for pk, text in Comment.objects.values_list('id', 'text').iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search (rowid, terms) VALUES (%s, %s)', rows
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_follow_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trend',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('group', 'Группа'), ('author', 'Автор')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('pending', models.PositiveIntegerField(default=0, verbose_name='Вес новых событий')),
+                ('score', models.FloatField(blank=True, null=True, verbose_name='Оценка')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата пересчёта')),
+            ],
+            options={
+                'verbose_name': 'Оценка популярности',
+                'verbose_name_plural': 'Оценки популярности',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trend',
+            index=models.Index(fields=['kind', '-score'], name='trend_kind_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trend',
+            index=models.Index(condition=models.Q(pending__gt=0), fields=['kind'], name='trend_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trend',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_trend'),
+        ),
+    ]
@@ -1,5 +1,8 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -15,6 +18,11 @@ class Group(models.Model):
         verbose_name='Описание группы',
         help_text='Введите описание группы',
     )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -33,6 +41,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -53,15 +65,61 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # JSON со списком уменьшенных копий картинки по форматам,
+    # его заполняет пул миниатюр (posts.thumbnails).
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты фильтруют по автору или группе и листаются курсором
+        # по (pub_date, id) от новых к старым. По updated считается
+        # Last-Modified главной.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(fields=['updated'], name='post_updated_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:30]
 
+    @property
+    def variants(self):
+        """Варианты картинки: {формат: [{name, width, height}, ...]}."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
+
+# Материализованный путь комментария — id предков и его собственный,
+# каждый дополнен нулями до PATH_SEGMENT цифр. Сортировка по пути
+# даёт ветку в порядке отрисовки, а ветка целиком — диапазон путей.
+PATH_SEGMENT = 10
+MAX_DEPTH = 10
+
+
+def path_segment(pk):
+    return str(pk).zfill(PATH_SEGMENT)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -85,15 +143,67 @@ class Comment(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    parent = models.ForeignKey(
+        'self',
+        related_name='replies',
+        on_delete=models.CASCADE,
+        verbose_name='Ответ на',
+        null=True,
+        blank=True
+    )
+    path = models.CharField(
+        'Путь в ветке',
+        max_length=PATH_SEGMENT * MAX_DEPTH,
+        default='',
+        editable=False
+    )
 
     class Meta:
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+            # Ветки и поддеревья читаются диапазоном путей.
+            models.Index(
+                fields=['post', 'path'],
+                name='comment_post_path_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:30]
 
+    def save(self, *args, **kwargs):
+        if self.parent_id and not self.pk:
+            parent = self.parent
+            if parent.depth >= MAX_DEPTH - 1:
+                # Глубже MAX_DEPTH ответы встают рядом с родителем.
+                self.parent = parent.parent
+        super().save(*args, **kwargs)
+        if not self.path:
+            self.path = (
+                (self.parent.path if self.parent_id else '')
+                + path_segment(self.pk)
+            )
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    @property
+    def depth(self):
+        """Уровень вложенности: 0 у комментария к посту."""
+        return max(len(self.path) // PATH_SEGMENT - 1, 0)
+
+    def subtree(self):
+        """Комментарий и все ответы на него в порядке отрисовки."""
+        return Comment.objects.filter(
+            post_id=self.post_id,
+            path__gte=self.path,
+            path__lt=self.path + '~',
+        ).order_by('path')
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -108,6 +218,136 @@ class Follow(models.Model):
         verbose_name='Подписка',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField('Дата подписки', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        # Списки подписчиков и подписок листаются курсором по дате.
+        indexes = [
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='follow_author_created_idx'
+            ),
+            models.Index(
+                fields=['user', '-created', '-id'],
+                name='follow_user_created_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow'
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'Подписка {self.user} на {self.author}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживают сигналы."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self) -> str:
+        return f'Счётчики {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок: пост, доставленный подписчику при записи."""
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        verbose_name='Читатель',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        verbose_name='Пост',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'Пост {self.post_id} в ленте {self.user_id}'
+
+
+class Trend(models.Model):
+    """Счётчик событий и затухающая оценка поста, группы или автора.
+
+    pending копит вес событий с прошлого пересчёта, score хранит
+    логарифм оценки, приведённой к началу эпохи (posts.trending).
+    """
+    POST = 'post'
+    GROUP = 'group'
+    AUTHOR = 'author'
+    KINDS = (
+        (POST, 'Пост'),
+        (GROUP, 'Группа'),
+        (AUTHOR, 'Автор'),
+    )
+
+    kind = models.CharField('Тип', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('id объекта')
+    pending = models.PositiveIntegerField('Вес новых событий', default=0)
+    score = models.FloatField('Оценка', null=True, blank=True)
+    updated = models.DateTimeField('Дата пересчёта', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Оценка популярности'
+        verbose_name_plural = 'Оценки популярности'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='unique_trend'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['kind', '-score'], name='trend_kind_score_idx'
+            ),
+            # Пересчёт читает только строки с новыми событиями.
+            models.Index(
+                fields=['kind'], name='trend_pending_idx',
+                condition=models.Q(pending__gt=0),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.kind} {self.object_id}: {self.score}'
@@ -0,0 +1,119 @@
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, moment, pk):
+    """Упаковывает позицию в ленте в непрозрачный токен."""
+    raw = f'{direction}|{moment.isoformat()}|{pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для мусора возвращает None."""
+    if not token:
+        return None
+    try:
+        direction, moment, pk = (
+            urlsafe_base64_decode(token).decode().split('|')
+        )
+        moment = parse_datetime(moment)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError, binascii.Error):
+        return None
+    if direction not in (NEXT, PREVIOUS) or moment is None:
+        return None
+    return direction, moment, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор по паре полей (дата, id).
+
+    Вместо COUNT(*) и OFFSET выбирает per_page + 1 строк после позиции
+    из курсора, поэтому стоимость страницы не зависит от её глубины.
+    Страница остаётся обычным Page: number равен 1 для первой страницы
+    ленты и 2 для остальных, а num_pages на единицу больше номера,
+    если дальше есть записи. Ссылки строятся по next_cursor и
+    previous_cursor.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 count=None):
+        super().__init__(object_list, per_page)
+        self.date_field, self.pk_field = keys
+        self.cursor = None
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._number = 1
+        self._has_next = False
+        if count is not None:
+            self.count = count
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def _fetch(self, queryset, keys, direction, position):
+        """Выбирает per_page + 1 строк после позиции в порядке обхода."""
+        date_field, pk_field = keys
+        sign = '-' if direction == NEXT else ''
+        queryset = queryset.order_by(
+            f'{sign}{date_field}', f'{sign}{pk_field}'
+        )
+        if position:
+            _, moment, pk = position
+            lookup = 'lt' if direction == NEXT else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': moment})
+                | Q(**{date_field: moment, f'{pk_field}__{lookup}': pk})
+            )
+        return list(queryset[:self.per_page + 1])
+
+    def _rows(self, direction, position):
+        return self._fetch(
+            self.object_list, (self.date_field, self.pk_field),
+            direction, position
+        )
+
+    def _make_cursor(self, direction, obj):
+        return encode_cursor(
+            direction,
+            getattr(obj, self.date_field),
+            getattr(obj, self.pk_field),
+        )
+
+    def get_page(self, cursor):
+        """Возвращает страницу после курсора или первую страницу."""
+        self.cursor = self.next_cursor = self.previous_cursor = None
+        position = decode_cursor(cursor)
+        direction = position[0] if position else NEXT
+        rows = self._rows(direction, position)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_previous, self._has_next = has_more, True
+        else:
+            has_previous, self._has_next = position is not None, has_more
+        if not rows:
+            if position:
+                # Курсор указывает за край ленты: начинаем сначала.
+                return self.get_page(None)
+            has_previous = self._has_next = False
+        self._number = 2 if has_previous else 1
+        self.cursor = cursor if position else None
+        if rows and self._has_next:
+            self.next_cursor = self._make_cursor(NEXT, rows[-1])
+        if rows and has_previous:
+            self.previous_cursor = self._make_cursor(PREVIOUS, rows[0])
+        return self._get_page(rows, self._number, self)
@@ -0,0 +1,238 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Тексты индексируются основами слов (posts.stemmer), поэтому запрос
+«котами» находит «кот» и «котов». Индекс обновляют сигналы моделей,
+а хранит его бэкенд из settings.SEARCH_BACKEND:
+
+* SQLiteFTSBackend — виртуальная таблица FTS5 posts_search с
+  ранжированием bm25; таблицу создаёт миграция;
+* LikeBackend — запасной вариант для баз без FTS5, ищет перебором.
+
+Результаты листаются курсором по (score, rowid), а сниппет с
+подсветкой строится по исходному тексту.
+"""
+import binascii
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Post
+from .stemmer import stem, stems, tokens
+
+POST = 'post'
+COMMENT = 'comment'
+KINDS = (POST, COMMENT)
+SNIPPET_WORDS = 30
+
+
+def rowid(kind, pk):
+    """Номер строки индекса: посты чётные, комментарии нечётные."""
+    return pk * 2 + KINDS.index(kind)
+
+
+def split_rowid(value):
+    return KINDS[value % 2], value // 2
+
+
+def encode_cursor(score, position):
+    return urlsafe_base64_encode(f'{score!r}|{position}'.encode())
+
+
+def decode_cursor(token):
+    """Позиция (score, rowid) из токена, для мусора None."""
+    if not token:
+        return None
+    try:
+        score, position = urlsafe_base64_decode(token).decode().split('|')
+        return float(score), int(position)
+    except (ValueError, TypeError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def snippet(text, query_stems, size=SNIPPET_WORDS):
+    """Кусок текста вокруг первого совпадения, найденные слова в <mark>."""
+    words = text.split()
+    marked = [
+        any(stem(token).startswith(query) for token in tokens(word)
+            for query in query_stems)
+        for word in words
+    ]
+    first = marked.index(True) if True in marked else 0
+    start = max(0, first - size // 3)
+    end = min(len(words), start + size)
+    parts = [
+        f'<mark>{escape(word)}</mark>' if hit else escape(word)
+        for word, hit in zip(words[start:end], marked[start:end])
+    ]
+    if start:
+        parts.insert(0, '…')
+    if end < len(words):
+        parts.append('…')
+    return mark_safe(' '.join(parts))
+
+
+@dataclass
+class Hit:
+    kind: str
+    post: Post
+    comment: Comment
+    score: float
+    snippet: str
+
+
+class SearchBackend:
+    """Интерфейс индекса: хранит основы слов и ищет по ним."""
+
+    def index(self, kind, pk, text):
+        raise NotImplementedError
+
+    def remove(self, kind, pk):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def match(self, query_stems, after, limit, kind=None):
+        """Список (score, rowid) по возрастанию score, затем rowid.
+
+        Меньший score — лучшее совпадение. after — позиция из
+        курсора, с которой продолжать выдачу; kind оставляет только
+        посты или только комментарии до ограничения limit.
+        """
+        raise NotImplementedError
+
+    def rebuild(self):
+        self.clear()
+        for pk, text in Post.objects.values_list('id', 'text').iterator():
+            self.index(POST, pk, text)
+        comments = Comment.objects.values_list('id', 'text').iterator()
+        for pk, text in comments:
+            self.index(COMMENT, pk, text)
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Индекс в таблице FTS5, ранжирование bm25."""
+
+    table = 'posts_search'
+
+    def index(self, kind, pk, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {self.table} (rowid, terms) '
+                f'VALUES (%s, %s)',
+                [rowid(kind, pk), stems(text)],
+            )
+
+    def remove(self, kind, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [rowid(kind, pk)],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def match(self, query_stems, after, limit, kind=None):
+        # Основы в кавычках с * ищутся как префиксы, а FTS5 не
+        # разбирает в них операторы из пользовательского ввода.
+        query = ' AND '.join(
+            '"{}"*'.format(term.replace('"', '""')) for term in query_stems
+        )
+        sql = (
+            f'SELECT score, id FROM ('
+            f'SELECT bm25({self.table}) AS score, rowid AS id '
+            f'FROM {self.table} WHERE {self.table} MATCH %s'
+        )
+        params = [query]
+        if kind is not None:
+            sql += ' AND rowid %% 2 = %s'
+            params.append(KINDS.index(kind))
+        sql += ')'
+        if after is not None:
+            sql += ' WHERE score > %s OR (score = %s AND id > %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, id LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+
+class LikeBackend(SearchBackend):
+    """Поиск перебором по текстам, для баз без полнотекстового индекса.
+
+    Индекс не хранится, все совпадения получают одинаковый score.
+    """
+
+    def index(self, kind, pk, text):
+        pass
+
+    def remove(self, kind, pk):
+        pass
+
+    def clear(self):
+        pass
+
+    def match(self, query_stems, after, limit, kind=None):
+        condition = Q()
+        for term in query_stems:
+            condition &= Q(text__icontains=term)
+        ids = sorted(
+            rowid(model_kind, pk)
+            for model_kind, model in ((POST, Post), (COMMENT, Comment))
+            if kind in (None, model_kind)
+            for pk in model.objects.filter(condition)
+            .values_list('id', flat=True)
+        )
+        if after is not None:
+            ids = [pk for pk in ids if pk > after[1]]
+        return [(0.0, pk) for pk in ids[:limit]]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def search(query, cursor=None, limit=None):
+    """Страница результатов и курсор следующей страницы (или None)."""
+    limit = limit or settings.PAGIN
+    query_stems = [stem(token) for token in tokens(query)]
+    if not query_stems:
+        return [], None
+    rows = get_backend().match(query_stems, decode_cursor(cursor), limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1])
+    ids = {POST: [], COMMENT: []}
+    for score, position in rows:
+        kind, pk = split_rowid(position)
+        ids[kind].append(pk)
+    posts = Post.objects.select_related('author', 'group').in_bulk(ids[POST])
+    comments = Comment.objects.select_related(
+        'author', 'post__author', 'post__group'
+    ).in_bulk(ids[COMMENT])
+    hits = []
+    for score, position in rows:
+        kind, pk = split_rowid(position)
+        if kind == POST and pk in posts:
+            post, comment = posts[pk], None
+            text = post.text
+        elif kind == COMMENT and pk in comments:
+            comment = comments[pk]
+            post, text = comment.post, comment.text
+        else:
+            continue
+        hits.append(
+            Hit(kind, post, comment, score, snippet(text, query_stems))
+        )
+    return hits, next_cursor
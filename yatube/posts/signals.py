@@ -0,0 +1,315 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.urls import NoReverseMatch, reverse
+
+from core import fragments, jobs, page_cache
+
+from . import counters, search, thumbnails, trending
+from .models import Comment, Follow, Group, Post, Trend, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    instance._old_group_id = None
+    if instance.pk and not raw:
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True)
+            .first()
+        )
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_image(sender, instance, raw=False, **kwargs):
+    instance._old_image = None
+    if instance.pk and not raw:
+        instance._old_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('image', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnail(sender, instance, raw=False, **kwargs):
+    if raw or (instance.image.name or None) == (instance._old_image or None):
+        return
+    if instance.image_variants:
+        # Варианты старой картинки больше не подходят.
+        instance.image_variants = ''
+        Post.objects.filter(pk=instance.pk).update(image_variants='')
+    if instance.image:
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        jobs.enqueue(
+            'posts.fan_out_post', instance.id, key=f'fan-out:{instance.id}'
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.shift_user(instance.author_id, 'posts_count', 1)
+        counters.shift_group(instance.group_id, 1)
+    elif instance._old_group_id != instance.group_id:
+        counters.shift_group(instance._old_group_id, -1)
+        counters.shift_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.shift_user(instance.author_id, 'posts_count', -1)
+    counters.shift_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.shift_post(instance.post_id, 1)
+        trending.record('comment', Trend.POST, instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.shift_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.shift_user(instance.author_id, 'followers_count', 1)
+        counters.shift_user(instance.user_id, 'following_count', 1)
+        trending.record('follow', Trend.AUTHOR, instance.author_id)
+        jobs.enqueue(
+            'posts.backfill_follow', instance.id,
+            key=f'backfill:{instance.id}',
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def drop_unfollowed_posts(sender, instance, **kwargs):
+    counters.shift_user(instance.author_id, 'followers_count', -1)
+    counters.shift_user(instance.user_id, 'following_count', -1)
+    jobs.enqueue('posts.drop_follow', instance.user_id, instance.author_id)
+
+
+# Страницы, которые показывают данные поколения, по его префиксу.
+PAGES = {
+    'posts': 'posts:index',
+    'author': 'posts:profile',
+    'group': 'posts:group_list',
+    'post': 'posts:post_detail',
+}
+
+
+def page_paths(names):
+    """Адреса страниц кэша целых страниц, зависящих от поколений.
+
+    Кэш страниц сбрасывается по тем же поколениям, что и фрагменты,
+    поэтому страница, показавшая объект, уходит вместе с ними.
+    """
+    paths = []
+    for name in names:
+        prefix, _, arg = name.partition(':')
+        if prefix not in PAGES:
+            continue
+        try:
+            paths.append(reverse(PAGES[prefix], args=[arg] if arg else []))
+        except NoReverseMatch:
+            # У слага, записанного в обход формы, страницы нет.
+            continue
+    return paths
+
+
+def expire(*names):
+    """Сбрасывает фрагменты и целые страницы, зависящие от поколений."""
+    fragments.bump(*names)
+    page_cache.purge(*page_paths(names))
+
+
+def post_generations(post, group_id=None):
+    """Поколения фрагментов, которые показывают пост."""
+    names = ['posts', f'post:{post.id}', f'author:{post.author.username}']
+    groups = {post.group_id, group_id} - {None}
+    names += [
+        f'group:{slug}' for slug in
+        Group.objects.filter(id__in=groups).values_list('slug', flat=True)
+    ]
+    return names
+
+
+@receiver(post_save, sender=Post)
+def expire_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        expire(*post_generations(
+            instance, getattr(instance, '_old_group_id', None)
+        ))
+
+
+@receiver(post_delete, sender=Post)
+def expire_deleted_post(sender, instance, **kwargs):
+    expire(*post_generations(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_post_comments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # comments — для ETag лент API с числом комментариев; страницы
+        # ленты и их фрагменты этого числа не показывают.
+        expire(f'post:{instance.post_id}', 'comments')
+
+
+def shown_post_generations(posts):
+    """Поколения страниц, где видны посты posts: сами посты и профили."""
+    names = set()
+    for post_id, username in posts.values_list('id', 'author__username'):
+        names |= {f'post:{post_id}', f'author:{username}'}
+    return names
+
+
+# Поля группы, которые видны в постах.
+GROUP_DISPLAY_FIELDS = ('slug', 'title')
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_names(sender, instance, raw=False, **kwargs):
+    instance._old_names = None
+    if instance.pk and not raw:
+        instance._old_names = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list(*GROUP_DISPLAY_FIELDS)
+            .first()
+        )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # После удаления у постов уже нет группы, поэтому их страницы
+    # запоминаются заранее, а сбрасываются после записи.
+    instance._shown = shown_post_generations(instance.posts.all())
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def expire_group(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_old_names', None)
+    slugs = {instance.slug, old[0] if old else None} - {None}
+    names = {'posts', *(f'group:{slug}' for slug in slugs)}
+    if hasattr(instance, '_shown'):
+        names |= instance._shown
+    elif old is not None and old != tuple(
+        getattr(instance, field) for field in GROUP_DISPLAY_FIELDS
+    ):
+        # Слаг и название видны на страницах постов и в профилях.
+        names |= shown_post_generations(instance.posts.all())
+    expire(*names)
+
+
+# Поля пользователя, которые видны в его постах.
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_user_names(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    instance._old_names = None
+    if update_fields is not None and not (
+        set(update_fields) & set(USER_DISPLAY_FIELDS)
+    ):
+        # Например, last_login при входе.
+        return
+    if instance.pk and not raw:
+        instance._old_names = (
+            User.objects.filter(pk=instance.pk)
+            .values_list(*USER_DISPLAY_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def expire_renamed_user(sender, instance, raw=False, **kwargs):
+    old = getattr(instance, '_old_names', None)
+    if raw or old is None:
+        return
+    new = tuple(getattr(instance, field) for field in USER_DISPLAY_FIELDS)
+    if old == new:
+        return
+    # Фрагменты постов сменят ключ сами, а ленты и страницы постов
+    # с комментариями пользователя — нет.
+    slugs = (
+        Group.objects.filter(posts__author=instance).distinct()
+        .values_list('slug', flat=True)
+    )
+    post_ids = set(instance.posts.values_list('id', flat=True))
+    post_ids.update(
+        Comment.objects.filter(author=instance)
+        .values_list('post_id', flat=True)
+    )
+    expire(
+        'posts',
+        *{f'author:{old[0]}', f'author:{instance.username}'},
+        *(f'group:{slug}' for slug in slugs),
+        *(f'post:{post_id}' for post_id in post_ids),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def expire_follow_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Профили обоих показывают число подписчиков и подписок.
+        usernames = User.objects.filter(
+            id__in=[instance.user_id, instance.author_id]
+        ).values_list('username', flat=True)
+        expire(
+            f'follow:{instance.user_id}',
+            *(f'author:{username}' for username in usernames),
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def index_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        kind = search.POST if sender is Post else search.COMMENT
+        search.get_backend().index(kind, instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def unindex_text(sender, instance, **kwargs):
+    kind = search.POST if sender is Post else search.COMMENT
+    search.get_backend().remove(kind, instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Group)
+def drop_trend(sender, instance, **kwargs):
+    kind = Trend.POST if sender is Post else Trend.GROUP
+    Trend.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+@receiver(request_finished)
+def flush_trending(sender, **kwargs):
+    # После ответа, чтобы запись событий не входила в время запроса.
+    trending.flush_if_due()
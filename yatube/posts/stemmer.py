@@ -0,0 +1,108 @@
+"""Стеммер русского языка по алгоритму Snowball (Портера).
+
+Отрезает от слова окончания и суффиксы, чтобы «постов», «посты» и
+«пост» давали одну основу. Латиница и цифры возвращаются как есть.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'(?:(?<=[ая])(?:в|вши|вшись)|ив|ивши|ившись|ыв|ывши|ывшись)$'
+)
+REFLEXIVE = re.compile(r'(?:ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому'
+    r'|их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(
+    r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)$'
+)
+VERB = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь'
+    r'|нно)|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен'
+    r'|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$'
+)
+NOUN = re.compile(
+    r'(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям'
+    r'|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+SUPERLATIVE = re.compile(r'(?:ейш|ейше)$')
+DERIVATIONAL = re.compile(r'ость?$')
+WORD = re.compile(r'\w+')
+
+
+def _regions(word):
+    """Начало областей RV и R2 по правилам Snowball."""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    r1 = len(word)
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    r2 = len(word)
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _strip(pattern, rv):
+    match = pattern.search(rv)
+    if match is None:
+        return rv, False
+    return rv[:match.start()], True
+
+
+def stem(word):
+    """Основа слова в нижнем регистре."""
+    word = word.lower().replace('ё', 'е')
+    if not re.search('[а-я]', word):
+        return word
+    start, r2_start = _regions(word)
+    head, rv = word[:start], word[start:]
+
+    # Шаг 1: деепричастие, иначе возвратная частица и окончание
+    # прилагательного, причастия, глагола или существительного.
+    rv, found = _strip(PERFECTIVE_GERUND, rv)
+    if not found:
+        rv, _ = _strip(REFLEXIVE, rv)
+        rv, found = _strip(ADJECTIVE, rv)
+        if found:
+            rv, _ = _strip(PARTICIPLE, rv)
+        else:
+            rv, found = _strip(VERB, rv)
+            if not found:
+                rv, _ = _strip(NOUN, rv)
+    # Шаг 2: конечная «и».
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    # Шаг 3: словообразующий суффикс, если он целиком в R2.
+    match = DERIVATIONAL.search(rv)
+    if match and start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+    # Шаг 4: «нн», превосходная степень, мягкий знак.
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        rv, found = _strip(SUPERLATIVE, rv)
+        if found and rv.endswith('нн'):
+            rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return head + rv
+
+
+def tokens(text):
+    """Слова текста в нижнем регистре."""
+    return WORD.findall(text.lower())
+
+
+def stems(text):
+    """Основы всех слов текста через пробел, для индекса."""
+    return ' '.join(stem(token) for token in tokens(text))
@@ -0,0 +1,68 @@
+"""Фоновые задачи posts для очереди core.jobs.
+
+Задачи получают id, а не объекты, и сами перечитывают их из базы:
+к моменту выполнения пост или подписка могут быть уже удалены.
+Сигналы сбрасывают поколения ещё до того, как воркер допишет ленты,
+поэтому задачи лент сбрасывают поколения follow:<id> ещё раз сами.
+"""
+import time
+
+from django.conf import settings
+
+from core import fragments, jobs
+
+from . import feed, thumbnails, trending
+from .models import Follow, Post
+
+
+@jobs.task('posts.fan_out_post')
+def fan_out_post(post_id):
+    post = Post.objects.filter(id=post_id).first()
+    if post is not None:
+        followers = feed.fan_out_post(post)
+        fragments.bump(*(f'follow:{user_id}' for user_id in followers))
+
+
+@jobs.task('posts.backfill_follow')
+def backfill_follow(follow_id):
+    follow = Follow.objects.filter(id=follow_id).first()
+    if follow is not None:
+        feed.backfill_follow(follow)
+        fragments.bump(f'follow:{follow.user_id}')
+
+
+@jobs.task('posts.drop_follow')
+def drop_follow(user_id, author_id):
+    # Если пользователь успел подписаться снова, ленту не трогаем.
+    follows = Follow.objects.filter(user_id=user_id, author_id=author_id)
+    if not follows.exists():
+        feed.drop_follow(Follow(user_id=user_id, author_id=author_id))
+        fragments.bump(f'follow:{user_id}')
+
+
+@jobs.task('posts.thumbnail')
+def thumbnail(name):
+    thumbnails.render(name)
+
+
+@jobs.task('posts.update_trending')
+def update_trending():
+    trending.fold()
+    schedule_trending()
+
+
+def schedule_trending():
+    """Ставит следующий пересчёт популярного через TRENDING_INTERVAL.
+
+    Ключ — номер следующего интервала, поэтому в каждом интервале
+    пересчёт стоит в очереди один раз. При JOBS_EAGER задача
+    выполнилась бы сразу же, и пересчёт запускают по расписанию.
+    """
+    if settings.JOBS_EAGER:
+        return
+    interval = settings.TRENDING_INTERVAL
+    slot = int(time.time() // interval) + 1
+    jobs.enqueue(
+        'posts.update_trending', key=f'trending:{slot}',
+        delay=slot * interval - time.time(),
+    )
@@ -0,0 +1,27 @@
+from django import template
+
+from posts.graph import FollowStatus
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/follow_button.html',
+                        takes_context=True)
+def follow_button(context, author):
+    """Кнопка подписки на автора для текущего пользователя.
+
+    {% follow_button post.author %}
+
+    Статус берётся из follow_status в контексте (его кладёт
+    posts.graph.follow_status_context), тогда на всю страницу уходит
+    один запрос. Без него тег проверит автора отдельным запросом.
+    """
+    status = context.get('follow_status')
+    if status is None or author.id not in status.ids:
+        status = FollowStatus(context['user'], [author.id])
+    show = status.can_follow(author.id)
+    return {
+        'author': author,
+        'show': show,
+        'following': show and status.is_following(author.id),
+    }
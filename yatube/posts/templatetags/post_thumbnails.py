@@ -0,0 +1,14 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(post):
+    """Источники для <picture> поста или None, пока вариантов нет.
+
+    {% post_picture post as picture %}
+    """
+    return thumbnails.picture(post)
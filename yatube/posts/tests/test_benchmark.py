@@ -0,0 +1,42 @@
+from django.core.signals import request_started
+from django.db import close_old_connections
+from django.test import TestCase
+
+from posts import benchmark
+from posts.models import FeedEntry, Follow, Post
+
+
+class BenchmarkTests(TestCase):
+    def test_seed(self):
+        """Синтетические данные создаются вместе с лентами и счётчиками."""
+        benchmark.seed(users=20, posts=100, groups=3, follows=40,
+                       comments=30)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 40)
+        self.assertEqual(
+            FeedEntry.objects.count(),
+            sum(
+                Post.objects.filter(author=follow.author).count()
+                for follow in Follow.objects.all()
+            ),
+        )
+
+    def test_run(self):
+        """Замер проходит по всем страницам без ошибок."""
+        benchmark.seed(users=5, posts=20, groups=1, follows=5, comments=5)
+        # WSGI-обработчик закрывает соединения в начале запроса, а тест
+        # работает внутри транзакции.
+        request_started.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+        result = benchmark.run(requests=3, clients=1)
+        self.assertEqual(
+            set(result['urls']),
+            {'index', 'profile', 'post_detail', 'group_posts',
+             'follow_index'},
+        )
+        for row in result['urls'].values():
+            self.assertEqual(row['errors'], 0)
+            self.assertGreater(row['queries'], 0)
+        self.assertEqual(
+            benchmark.compare(result, result)[0].count('+0%'), 1
+        )
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import jobs
+
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_feed(self):
+        """Подписка докладывает в ленту старые посты автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=self.old_post
+        ).exists())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        entry = FeedEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_unfollow_clears_feed(self):
+        """После отписки посты автора пропадают из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора не раздаются, а читаются напрямую."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(JOBS_EAGER=False)
+    def test_worker_expires_feed_fragments(self):
+        """Ленты, дописанные воркером, не остаются в кэше старыми."""
+        cache.clear()
+        api_url = reverse('api:follow_index')
+        self.assertNotContains(self.page(), self.old_post.text)
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        # Страница, открытая до воркера, кэширует ещё пустую ленту.
+        self.assertNotContains(self.page(), self.old_post.text)
+        etag = self.client.get(api_url)['ETag']
+        self.drain()
+        self.assertContains(self.page(), self.old_post.text)
+        response = self.client.get(api_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertNotContains(self.page(), 'Новый пост')
+        self.drain()
+        self.assertContains(self.page(), 'Новый пост')
+
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertContains(self.page(), self.old_post.text)
+        self.drain()
+        self.assertNotContains(self.page(), self.old_post.text)
+
+    def page(self):
+        return self.client.get(reverse('posts:follow_index'))
+
+    def drain(self):
+        while True:
+            job = jobs.claim()
+            if job is None:
+                return
+            jobs.run(job)
@@ -1,5 +1,8 @@
+import gc
 import shutil
+import sys
 import tempfile
+from io import BytesIO
 from xml.etree.ElementTree import Comment
 
 from django.conf import settings
@@ -7,6 +10,7 @@ from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Comment, Group, Post
@@ -119,3 +123,95 @@ class PostCreateFormTests(TestCase):
         ))
         self.assertEqual(Comment.objects.count(), comments_count + 1)
         self.assertEqual(comments.text, form_data['text'])
+
+    def post_image(self, image):
+        return self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=10)
+    def test_image_too_large(self):
+        """Файл больше лимита отклоняется формой."""
+        response = self.post_image(self.image_create())
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 10\xa0байт.'
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=10)
+    def test_upload_stops_at_limit(self):
+        """После лимита размера остаток запроса не читается."""
+        response = self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': self.image_create(),
+                'group': self.group.id,
+            },
+        )
+        self.assertTrue(response.wsgi_request.upload_too_large)
+        self.assertNotIn('group', response.wsgi_request.POST)
+
+    @override_settings(POST_IMAGE_MAX_DECODE_PIXELS=1)
+    def test_decode_limit_spares_jpeg(self):
+        """Меньший лимит пикселей касается форматов без draft-режима."""
+        response = self.post_image(self.image_create())
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большая картинка: 2×1.'
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (2, 1), 'red').save(buffer, 'JPEG')
+        self.post_image(
+            SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+        )
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1)
+    def test_image_too_many_pixels(self):
+        """Картинка с лишними пикселями отклоняется по заголовку."""
+        posts_count = Post.objects.count()
+        response = self.post_image(self.image_create())
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большая картинка: 2×1.'
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_image_downscaled_without_exif(self):
+        """Большая картинка уменьшается, EXIF вырезается."""
+        buffer = BytesIO()
+        image = Image.new('RGB', (400, 300), 'red')
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        image.save(buffer, 'JPEG', exif=exif)
+        # Незакрытый временный файл ругался бы при сборке мусора.
+        ignored = []
+        hook, sys.unraisablehook = sys.unraisablehook, ignored.append
+        try:
+            self.post_image(SimpleUploadedFile(
+                'photo.jpg', buffer.getvalue(), 'image/jpeg'
+            ))
+            gc.collect()
+        finally:
+            sys.unraisablehook = hook
+        self.assertEqual(ignored, [])
+        post = Post.objects.exclude(image='').get()
+        with Image.open(post.image) as saved:
+            self.assertEqual(saved.size, (100, 75))
+            self.assertNotIn('exif', saved.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_animation_kept(self):
+        """Анимированная картинка не пересжимается в один кадр."""
+        buffer = BytesIO()
+        first, second = (
+            Image.new('RGB', (400, 300), color) for color in ('red', 'blue')
+        )
+        first.save(buffer, 'PNG', save_all=True, append_images=[second])
+        self.post_image(
+            SimpleUploadedFile('anim.png', buffer.getvalue(), 'image/png')
+        )
+        post = Post.objects.exclude(image='').get()
+        with Image.open(post.image) as saved:
+            self.assertEqual(saved.size, (400, 300))
+            self.assertEqual(saved.n_frames, 2)
@@ -0,0 +1,146 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+
+from .. import graph
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowGraphTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('ann', 'bob', 'cid', 'dan', 'eve')
+        }
+
+    def follow(self, user, author):
+        Follow.objects.create(
+            user=self.users[user], author=self.users[author]
+        )
+
+    def test_mutual(self):
+        """Взаимная подписка видна обеим сторонам одним запросом."""
+        ann, bob = self.users['ann'], self.users['bob']
+        self.follow('ann', 'bob')
+        self.assertFalse(graph.is_mutual(ann, bob))
+        self.follow('bob', 'ann')
+        self.follow('ann', 'cid')
+        with self.assertNumQueries(1):
+            self.assertTrue(graph.is_mutual(bob, ann))
+        with self.assertNumQueries(1):
+            mutual = graph.mutual_ids(ann, [bob.id, self.users['cid'].id])
+        self.assertEqual(mutual, {bob.id})
+
+    def test_follow_lists(self):
+        """Списки листаются курсором, взаимные подписки отмечены."""
+        for name in ('bob', 'cid', 'dan', 'eve'):
+            self.follow(name, 'ann')
+        self.follow('ann', 'eve')
+        url = reverse('posts:followers', args=['ann'])
+        seen = []
+        cursor = ''
+        with self.settings(PAGIN=3):
+            while True:
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertWithinQueryBudget(response)
+                seen += [
+                    (person.username, mutual)
+                    for person, mutual in response.context['people']
+                ]
+                page = response.context['page_obj']
+                if not page.has_next():
+                    break
+                cursor = page.paginator.next_cursor
+        self.assertEqual(
+            seen,
+            [('eve', True), ('dan', False), ('cid', False), ('bob', False)],
+        )
+        self.client.force_login(self.users['bob'])
+        response = self.client.get(reverse('posts:following', args=['ann']))
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(
+            [person.username for person, _ in response.context['people']],
+            ['eve'],
+        )
+        self.assertWithinQueryBudget(self.client.get(url))
+
+    @override_settings(SUGGESTIONS_LIMIT=2)
+    def test_suggestions_are_built_offline(self):
+        """Друзья друзей ранжируются по числу путей и читаются из кэша."""
+        ann = self.users['ann']
+        self.follow('ann', 'bob')
+        self.follow('ann', 'cid')
+        self.follow('bob', 'dan')
+        self.follow('cid', 'dan')
+        self.follow('cid', 'eve')
+        self.follow('bob', 'ann')
+        self.client.force_login(ann)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['suggestions'], [])
+
+        call_command('build_suggestions', '--batch-size', '2',
+                     stdout=StringIO())
+        with self.assertNumQueries(1):
+            found = graph.suggestions(ann)
+        self.assertEqual(found, [self.users['dan'], self.users['eve']])
+
+        # Подписка после расчёта убирает автора без пересчёта.
+        self.follow('ann', 'dan')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.context['suggestions'], [self.users['eve']])
+
+
+class FollowStatusTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(author=self.author, text='Пост')
+        self.client.force_login(self.reader)
+
+    def index_queries(self):
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertWithinQueryBudget(response)
+        return response.wsgi_request.query_stats.count
+
+    def test_feed_buttons_cost_one_query(self):
+        """Кнопки подписки на всех авторов ленты — один запрос."""
+        before = self.index_queries()
+        for i in range(5):
+            author = User.objects.create_user(username=f'author{i}')
+            Post.objects.create(author=author, text='Пост')
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertEqual(self.index_queries(), before)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Отписаться', count=5)
+        self.assertContains(response, 'Подписаться', count=1)
+
+    def test_buttons_follow_the_reader(self):
+        """Кэш ленты не путает кнопки разных читателей и анонима."""
+        self.client.get(reverse('posts:index'))
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Отписаться'
+        )
+        self.assertNotContains(
+            self.client_class().get(reverse('posts:index')), 'Подписаться'
+        )
+
+    def test_profile_following(self):
+        """Профиль показывает настоящий статус подписки."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertFalse(self.client.get(url).context['following'])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(self.client.get(url).context['following'])
+        self.assertFalse(self.client_class().get(url).context['following'])
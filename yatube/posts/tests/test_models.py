@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from ..models import Comment, Group, Post
+from ..models import MAX_DEPTH, Comment, Follow, Group, Post, path_segment
 
 User = get_user_model()
 
@@ -87,3 +91,74 @@ class PostsModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     group._meta.get_field(field).help_text, expected_value)
+
+    def test_follow_is_unique_and_not_self(self):
+        """Нельзя подписаться дважды и на самого себя."""
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        for user, target in ((self.user, author), (author, author)):
+            with self.subTest(user=user, author=target):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=user, author=target)
+
+    def test_explain_queries_finds_no_bad_plans(self):
+        """Запросы страниц posts идут по индексам."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        Comment.objects.create(
+            post=self.post, author=reader, text='Ответ', parent=self.comment
+        )
+        out = StringIO()
+        call_command('explain_queries', '--strict', stdout=out)
+        for name in ('search', 'trending', 'comments', 'followers',
+                     'following'):
+            with self.subTest(name=name):
+                self.assertIn(name, out.getvalue())
+        self.assertIn('?root=', out.getvalue())
+        self.assertIn('Запросов с плохим планом: 0', out.getvalue())
+
+
+class CommentThreadTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.root = self.reply(None)
+
+    def reply(self, parent):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text='Ответ', parent=parent
+        )
+
+    def test_path_and_depth(self):
+        """Путь ответа — путь родителя и свой id."""
+        child = self.reply(self.root)
+        grandchild = self.reply(child)
+        self.assertEqual(self.root.depth, 0)
+        self.assertEqual(grandchild.depth, 2)
+        self.assertEqual(
+            grandchild.path,
+            path_segment(self.root.id) + path_segment(child.id)
+            + path_segment(grandchild.id),
+        )
+
+    def test_depth_is_capped(self):
+        """Ответы глубже MAX_DEPTH встают рядом с родителем."""
+        comment = self.root
+        for _ in range(MAX_DEPTH + 2):
+            comment = self.reply(comment)
+        self.assertEqual(comment.depth, MAX_DEPTH - 1)
+        self.assertLessEqual(
+            len(comment.path), Comment._meta.get_field('path').max_length
+        )
+
+    def test_subtree_in_render_order(self):
+        """Поддерево читается одним запросом в порядке отрисовки."""
+        first = self.reply(self.root)
+        second = self.reply(self.root)
+        nested = self.reply(first)
+        other = self.reply(None)
+        with self.assertNumQueries(1):
+            ids = [comment.id for comment in self.root.subtree()]
+        self.assertEqual(ids, [self.root.id, first.id, nested.id, second.id])
+        self.assertNotIn(other.id, ids)
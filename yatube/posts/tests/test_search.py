@@ -0,0 +1,115 @@
+from django.contrib.admin import site as admin_site
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+
+from posts.models import Comment, Post
+from posts.search import search
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class SearchTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.cats = Post.objects.create(
+            author=self.author, text='Мои коты спят на диване весь день'
+        )
+        self.dogs = Post.objects.create(
+            author=self.author, text='Собака гуляет во дворе'
+        )
+        self.comment = Comment.objects.create(
+            post=self.dogs, author=self.author, text='А у меня три кота'
+        )
+
+    def test_stem(self):
+        """Разные формы слова дают одну основу."""
+        self.assertEqual(stem('котами'), stem('коты'))
+        self.assertEqual(stem('публикации'), stem('публикация'))
+
+    def test_posts_and_comments_found(self):
+        """Поиск находит посты и комментарии по формам слова."""
+        hits, _ = search('котов')
+        found = {(hit.kind, hit.post.id) for hit in hits}
+        self.assertEqual(
+            found, {('post', self.cats.id), ('comment', self.dogs.id)}
+        )
+        self.assertIn('<mark>коты</mark>', [
+            hit.snippet for hit in hits if hit.kind == 'post'
+        ][0])
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        self.dogs.text = 'Кошка на подоконнике'
+        self.dogs.save()
+        self.assertEqual(search('собака')[0], [])
+        self.assertEqual(len(search('кошки')[0]), 1)
+        self.comment.delete()
+        self.cats.delete()
+        self.assertEqual(search('кот')[0], [])
+
+    def test_cursor(self):
+        """Результаты листаются курсором без повторов."""
+        for number in range(5):
+            Post.objects.create(author=self.author, text=f'Кот номер {number}')
+        first, cursor = search('кот', limit=4)
+        second, last = search('кот', cursor, limit=4)
+        self.assertIsNone(last)
+        self.assertEqual(len(first) + len(second), 7)
+        keys = [(hit.kind, hit.comment or hit.post) for hit in first + second]
+        self.assertEqual(len(set(keys)), 7)
+
+    def test_view(self):
+        """Страница поиска отдаёт результаты и не падает на мусоре."""
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertContains(response, '<mark>')
+        for query in ('"', 'NEAR(', '*', ''):
+            response = self.client.get(reverse('posts:search'), {'q': query})
+            self.assertEqual(response.status_code, 200)
+
+    def test_view_budget(self):
+        """Страница поиска укладывается в бюджет и для вошедших."""
+        for login in (False, True):
+            if login:
+                self.client.force_login(self.author)
+            response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+            self.assertWithinQueryBudget(response)
+
+    def test_admin_search(self):
+        """Поиск в админке ищет по индексу и не падает на знаках."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        self.client.force_login(admin)
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url, {'q': 'котов'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cats]
+        )
+        for query in ('!!!', '"'):
+            with self.subTest(query=query):
+                response = self.client.get(url, {'q': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.context['cl'].result_list)
+
+    def test_admin_search_limit_by_kind(self):
+        """Лимит поиска в админке считает только строки своей модели."""
+        for number in range(3):
+            Comment.objects.create(
+                post=self.dogs, author=self.author, text=f'Кот номер {number}'
+            )
+        post_admin = admin_site._registry[Post]
+        post_admin.search_limit = 2
+        self.addCleanup(delattr, post_admin, 'search_limit')
+        self.client.force_login(User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        ))
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кот'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cats]
+        )
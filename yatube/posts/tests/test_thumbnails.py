@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                    b'\x0A\x00\x3B'
+                ),
+                content_type='image/gif'
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_rendered(self):
+        """Страница не делает миниатюру сама, а показывает заглушку."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        response = self.client.get(url)
+        self.assertContains(response, 'Картинка обрабатывается')
+        self.assertIsNone(thumbnails.picture(self.post))
+
+        thumbnails.render(self.post.image.name)
+        post = Post.objects.get(id=self.post.id)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Картинка обрабатывается')
+        self.assertContains(response, thumbnails.picture(post)['src'])
+
+    def test_render_marks_post_updated(self):
+        """Готовая миниатюра сбрасывает кэш фрагментов поста."""
+        updated = self.post.updated
+        thumbnails.render(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.updated, updated)
+        stats = thumbnails.stats()
+        self.assertEqual(stats['done'], 1)
+        self.assertGreaterEqual(stats['avg_ms'], 0)
+
+    def test_missing_file_skipped(self):
+        """Отсутствующий файл пропускается без ошибки."""
+        self.assertIsNone(thumbnails.render('posts/missing.gif'))
+        self.assertEqual(thumbnails.stats()['skipped'], 1)
+
+    def test_variants(self):
+        """Варианты нескольких ширин попадают в пост и в srcset."""
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, 'JPEG')
+        post = Post.objects.create(
+            author=self.author,
+            text='Большая картинка',
+            image=SimpleUploadedFile('big.jpg', buffer.getvalue()),
+        )
+        thumbnails.render(post.image.name)
+        post.refresh_from_db()
+        self.assertEqual(
+            [item['width'] for item in post.variants['JPEG']], [480, 960]
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.id])
+        )
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, ' 480w')
+        self.assertContains(response, ' 960w')
+
+    def test_new_image_resets_variants(self):
+        """Смена картинки сбрасывает варианты прежней."""
+        post = Post.objects.get(id=self.post.id)
+        thumbnails.render(post.image.name)
+        post.refresh_from_db()
+        self.assertTrue(post.variants)
+        post.image = SimpleUploadedFile(
+            'other.gif', post.image.read(), content_type='image/gif'
+        )
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.variants, {})
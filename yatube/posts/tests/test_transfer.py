@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search, transfer
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group if n % 2 else None,
+                text=f'Пост номер {n} про котов',
+            )
+            for n in range(5)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def export_all(self, extension):
+        for kind in transfer.FIELDS:
+            call_command('export_data', kind, self.path(f'{kind}.{extension}'),
+                         stderr=StringIO())
+
+    def import_all(self, extension):
+        for kind in transfer.FIELDS:
+            call_command('import_data', kind, self.path(f'{kind}.{extension}'),
+                         batch_size=2, stdout=StringIO(),
+                         stderr=StringIO())
+
+    def assert_round_trip(self, extension):
+        dates = list(Post.objects.order_by('id').values_list('pub_date',
+                                                             flat=True))
+        self.export_all(extension)
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        self.import_all(extension)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('pub_date',
+                                                         flat=True)),
+            dates,
+        )
+        self.assertEqual(Post.objects.filter(group__isnull=True).count(), 3)
+        self.assertEqual(Post.objects.get(id=self.posts[0].id)
+                         .comments_count, 1)
+        self.assertEqual(Group.objects.get().posts_count, 2)
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(),
+                         5)
+        hits, _ = search.search('котам')
+        self.assertEqual(len(hits), 5)
+        self.assertFalse(
+            os.path.exists(transfer.progress_path(self.path(f'post.'
+                                                            f'{extension}')))
+        )
+
+    def test_round_trip_ndjson(self):
+        """Выгрузка и загрузка NDJSON восстанавливают данные и производные."""
+        self.assert_round_trip('ndjson')
+
+    def test_round_trip_csv(self):
+        """Выгрузка и загрузка CSV восстанавливают данные и производные."""
+        self.assert_round_trip('csv')
+
+    def test_export_resume(self):
+        """Продолженная выгрузка дописывает только новые строки."""
+        path = self.path('post.csv')
+        call_command('export_data', 'post', path,
+                     stderr=StringIO())
+        Post.objects.create(author=self.author, text='Новый пост')
+        call_command('export_data', 'post', path, resume=True,
+                     stderr=StringIO())
+        with open(path, encoding='utf-8') as file:
+            rows = list(transfer.read_rows(file, transfer.CSV))
+        self.assertEqual([int(row['id']) for row in rows],
+                         list(Post.objects.order_by('id')
+                              .values_list('id', flat=True)))
+
+    def test_export_resume_after_cut_line(self):
+        """Обрывок последней строки отрезается перед продолжением."""
+        path = self.path('post.ndjson')
+        call_command('export_data', 'post', path, stderr=StringIO())
+        with open(path, 'rb+') as file:
+            file.truncate(file.seek(0, os.SEEK_END) - 5)
+        call_command('export_data', 'post', path, resume=True,
+                     stderr=StringIO())
+        with open(path, encoding='utf-8') as file:
+            rows = list(transfer.read_rows(file, transfer.NDJSON))
+        self.assertEqual([row['id'] for row in rows],
+                         list(Post.objects.order_by('id')
+                              .values_list('id', flat=True)))
+
+    def test_export_resume_csv_multiline(self):
+        """CSV с переводами строк в тексте обрезается по целой записи."""
+        for post in self.posts:
+            post.text = f'Первая строка\nвторая "в кавычках"\nтретья {post.id}'
+            post.save()
+        path = self.path('post.csv')
+        call_command('export_data', 'post', path, stderr=StringIO())
+        with open(path, 'rb') as file:
+            data = file.read()
+        # Обрыв внутри текста последнего поста, сразу после перевода
+        # строки: построчно хвост выглядит как целая строка.
+        line = 'Первая строка\n'.encode()
+        with open(path, 'wb') as file:
+            file.write(data[:data.rindex(line) + len(line)])
+        call_command('export_data', 'post', path, resume=True,
+                     stderr=StringIO())
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = list(transfer.read_rows(file, transfer.CSV))
+        self.assertEqual([int(row['id']) for row in rows],
+                         [post.id for post in self.posts])
+        self.assertEqual([row['text'] for row in rows],
+                         [post.text for post in self.posts])
+
+    def test_import_resume(self):
+        """Загрузка продолжается с места, записанного в файле прогресса."""
+        path = self.path('post.ndjson')
+        call_command('export_data', 'post', path,
+                     stderr=StringIO())
+        skipped = Post.objects.order_by('id')[:3]
+        skipped_ids = [post.id for post in skipped]
+        Post.objects.all().delete()
+        transfer.write_progress(path, 3)
+        done = list(transfer.import_rows('post', path, transfer.NDJSON))
+        self.assertEqual(done, [5])
+        self.assertFalse(Post.objects.filter(id__in=skipped_ids).exists())
+        self.assertEqual(Post.objects.count(), 2)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import QueryBudgetMixin
+
+from .. import trending
+from ..models import Comment, Follow, Group, Post, Trend
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE=3600)
+class TrendingTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        # События других тестов, накопленные в процессе, здесь не нужны.
+        trending.flush()
+        Trend.objects.all().delete()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.quiet = Post.objects.create(author=self.author, text='Тихий')
+        self.loud = Post.objects.create(
+            author=self.author, text='Громкий', group=self.group
+        )
+
+    def test_decay(self):
+        """За период полураспада вес события падает вдвое."""
+        now = timezone.now()
+        score = trending.log_weight(10, now)
+        self.assertAlmostEqual(
+            trending.current(score, now + timedelta(hours=1)), 5
+        )
+        later = trending.logaddexp(score, trending.log_weight(10, now))
+        self.assertAlmostEqual(trending.current(later, now), 20)
+
+    def test_events_rank_posts_and_groups(self):
+        """Комментарии и просмотры поднимают пост и его группу."""
+        self.client.get(reverse('posts:post_detail', args=[self.quiet.id]))
+        Comment.objects.create(
+            post=self.loud, author=self.author, text='Комментарий'
+        )
+        self.assertEqual(trending.fold(), 3)
+        self.assertEqual(
+            trending.trending_posts(), [self.loud, self.quiet]
+        )
+        self.assertEqual(trending.trending_groups(), [self.group])
+        self.assertFalse(Trend.objects.filter(pending__gt=0).exists())
+
+    def test_old_events_fade(self):
+        """Старая активность уступает свежей меньшего веса."""
+        Comment.objects.create(
+            post=self.loud, author=self.author, text='Комментарий'
+        )
+        trending.fold(timezone.now() - timedelta(hours=3))
+        trending.record('view', Trend.POST, self.quiet.id)
+        trending.fold()
+        self.assertEqual(
+            trending.top(Trend.POST), [self.quiet.id, self.loud.id]
+        )
+
+    def test_follow_credits_latest_post(self):
+        """Подписка на автора засчитывается его свежему посту."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        trending.fold()
+        self.assertEqual(trending.top(Trend.POST), [self.loud.id])
+        self.assertEqual(trending.top(Trend.GROUP), [self.group.id])
+
+    def test_reads_come_from_cache(self):
+        """Страница читает готовые списки и не сортирует оценки."""
+        trending.record('comment', Trend.POST, self.quiet.id)
+        trending.fold()
+        with self.assertNumQueries(0):
+            trending.top(Trend.POST)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(list(response.context['posts']), [self.quiet])
+        # Вошедший читатель при потерянном кэше списков.
+        cache.clear()
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(list(response.context['posts']), [self.quiet])
+        self.quiet.delete()
+        trending.fold()
+        self.assertEqual(trending.trending_posts(), [])
@@ -9,9 +9,12 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core import fragments
+from core.testing import QueryBudgetMixin
 from posts.forms import PostForm
 
-from ..models import Follow, Group, Post
+from ..models import Comment, Follow, Group, Post
+from ..paginator import CursorPaginator
 
 User = get_user_model()
 
@@ -122,20 +125,91 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_image_0, self.post.image)
 
     def test_cache_index(self):
-        """Проверка хранения и очищения кэша для index."""
+        """Главная берётся из кэша, пока посты не менялись,
+        и сразу обновляется после записи."""
         response = self.authorized_author.get(reverse('posts:index'))
         posts = response.content
+        # update() не шлёт сигналов, поэтому версия ленты прежняя.
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
+        response_old = self.authorized_author.get(reverse('posts:index'))
+        old_posts = response_old.content
+        self.assertEqual(old_posts, posts)
         Post.objects.create(
             text='test_new_post',
             author=self.author,
         )
-        response_old = self.authorized_author.get(reverse('posts:index'))
-        old_posts = response_old.content
-        self.assertEqual(old_posts, posts)
-        cache.clear()
         response_new = self.authorized_author.get(reverse('posts:index'))
         new_posts = response_new.content
         self.assertNotEqual(old_posts, new_posts)
+        self.assertContains(response_new, 'test_new_post')
+
+    def test_fragment_stats(self):
+        """Попадания и промахи считаются по каждому фрагменту."""
+        fragments.flush()
+        cache.clear()
+        self.authorized_author.get(reverse('posts:index'))
+        self.authorized_author.get(reverse('posts:index'))
+        stats = fragments.stats()
+        self.assertEqual(stats['index_page']['hits'], 1)
+        self.assertEqual(stats['index_page']['misses'], 1)
+        self.assertEqual(stats['post']['misses'], 1)
+
+    def test_renames_reach_post_fragments(self):
+        """Новые имя автора и слаг группы видны в лентах из кэша."""
+        writer = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание'
+        )
+        Post.objects.create(author=writer, group=group, text='Война и мир')
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['classics']),
+        ]
+        for page in pages:
+            self.assertContains(self.client.get(page), 'Лев Толстой')
+        writer.first_name = 'Лёва'
+        writer.save()
+        for page in pages:
+            self.assertContains(self.client.get(page), 'Лёва Толстой')
+        group.slug = 'classic'
+        group.save()
+        self.assertContains(
+            self.client.get(reverse('posts:index')),
+            reverse('posts:group_list', args=['classic']),
+        )
+
+    def test_renames_reach_post_pages(self):
+        """Страницы поста и профиль не хранят старые имена и слаги."""
+        commenter = User.objects.create_user(username='commenter')
+        group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание'
+        )
+        post = Post.objects.create(
+            author=self.author, group=group, text='Война и мир'
+        )
+        Comment.objects.create(post=post, author=commenter, text='Читал')
+        detail = reverse('posts:post_detail', args=[post.id])
+        profile = reverse('posts:profile', args=[self.author.username])
+        for url in (detail, profile):
+            self.authorized_client.get(url)
+        commenter.username = 'reader'
+        commenter.save()
+        group.slug = 'classic'
+        group.title = 'Русская классика'
+        group.save()
+        response = self.authorized_client.get(detail)
+        self.assertContains(
+            response, reverse('posts:profile', args=['reader'])
+        )
+        self.assertContains(response, 'Русская классика')
+        self.assertNotContains(response, '/group/classics/')
+        response = self.authorized_client.get(profile)
+        self.assertContains(
+            response, reverse('posts:group_list', args=['classic'])
+        )
+        self.assertNotContains(response, '/group/classics/')
 
     def test_follow(self):
         """Проверка возможности подписаться на автора"""
@@ -193,6 +267,10 @@ class PaginatorViewsTest(TestCase):
             + str(i)
         )for i in range(13)])
 
+    def setUp(self):
+        # bulk_create не сбрасывает кэш страниц, а тестам нужен контекст.
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         """Тест паджинатора для шаблонов index, group_list, profile"""
         for page_name, kwarg in self.paginator_pages.items():
@@ -204,7 +282,236 @@ class PaginatorViewsTest(TestCase):
         """Тест 2 страницы паджинатора шаблонов index, group_list, profile"""
         for page_name, kwarg in self.paginator_pages.items():
             with self.subTest(page_name=page_name):
-                response = self.client.get(reverse(
-                    page_name,
-                    kwargs=kwarg) + '?page=2')
-                self.assertEqual(len(response.context['page_obj']), 3)
+                url = reverse(page_name, kwargs=kwarg)
+                first = self.client.get(url).context['page_obj']
+                response = self.client.get(
+                    url, {'cursor': first.paginator.next_cursor}
+                )
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), 3)
+                self.assertFalse(page_obj.has_next())
+                self.assertTrue(page_obj.has_previous())
+
+    def test_previous_cursor_returns_first_page(self):
+        """Курсор назад возвращает те же записи, что и первая страница."""
+        url = reverse('posts:index')
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'cursor': first.paginator.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            url, {'cursor': second.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'garbage'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_page_query_count_does_not_depend_on_depth(self):
+        """Страница ленты читается одним запросом без COUNT(*)."""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            paginator.get_page(first.paginator.next_cursor)
+
+
+class QueryBudgetViewsTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовый текст',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(12):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}'
+            )
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.reader)
+
+    def test_feeds_stay_within_query_budget(self):
+        """Страницы не делают запрос на каждый пост или комментарий."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.authorized_client.get(url)
+                self.assertWithinQueryBudget(response)
+
+
+@override_settings(COMMENTS_PAGIN=5)
+class CommentPagesTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.comments = [
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Комментарий {i}'
+            )
+            for i in range(12)
+        ]
+        self.client.force_login(self.author)
+
+    def test_first_page(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        page = response.context['comments']
+        self.assertEqual(len(page), 5)
+        self.assertTrue(page.has_next())
+        self.assertContains(response, 'data-more-comments')
+        self.assertContains(response, 'media-body', count=5)
+
+    def test_fragment_pages(self):
+        """Догрузка отдаёт следующие страницы без повторов."""
+        url = reverse('posts:comments', args=[self.post.id])
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertWithinQueryBudget(response)
+            page = response.context['comments']
+            seen += [comment.id for comment in page]
+            if not page.has_next():
+                break
+            cursor = page.paginator.next_cursor
+        self.assertEqual(seen, [c.id for c in reversed(self.comments)])
+        self.assertNotContains(response, 'data-more-comments')
+
+    def test_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы поста не растёт с комментариями."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        before = self.client.get(url).wsgi_request.query_stats.count
+        for i in range(20):
+            Comment.objects.create(
+                post=self.post, author=self.reader(i), text='Ещё'
+            )
+        cache.clear()
+        after = self.client.get(url).wsgi_request.query_stats.count
+        self.assertEqual(before, after)
+
+    def reader(self, number):
+        return User.objects.create_user(username=f'reader{number}')
+
+
+class CommentThreadViewsTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.root = Comment.objects.create(
+            post=self.post, author=self.author, text='Корень'
+        )
+        self.client.force_login(self.author)
+
+    def test_replies_follow_their_root(self):
+        """Ответы выводятся сразу за родителем, курсор листает корни."""
+        reply = Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ',
+            parent=self.root,
+        )
+        newer = Comment.objects.create(
+            post=self.post, author=self.author, text='Новее'
+        )
+        response = self.client.get(
+            reverse('posts:comments', args=[self.post.id])
+        )
+        self.assertWithinQueryBudget(response)
+        page = response.context['comments']
+        self.assertEqual([c.id for c in page], [newer.id, self.root.id])
+        self.assertEqual(
+            [c.id for c in page.thread], [newer.id, self.root.id, reply.id]
+        )
+
+    def test_queries_do_not_depend_on_replies(self):
+        """Число запросов не зависит от глубины веток."""
+        url = reverse('posts:comments', args=[self.post.id])
+        parent = Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ',
+            parent=self.root,
+        )
+        before = self.client.get(url).wsgi_request.query_stats.count
+        for i in range(8):
+            parent = Comment.objects.create(
+                post=self.post, author=User.objects.create_user(f'r{i}'),
+                text='Ответ', parent=parent,
+            )
+        cache.clear()
+        after = self.client.get(url).wsgi_request.query_stats.count
+        self.assertEqual(before, after)
+
+    @override_settings(REPLIES_PAGIN=5)
+    def test_wide_thread_is_bounded(self):
+        """Под корнем не больше REPLIES_PAGIN ответов, остаток догружается."""
+        replies = [
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Ответ {i}',
+                parent=self.root,
+            )
+            for i in range(12)
+        ]
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        self.assertWithinQueryBudget(response)
+        self.assertContains(response, 'media-body', count=6)
+        self.assertContains(response, 'Показать ещё ответы', count=1)
+        seen = [c.id for c in response.context['comments'].thread[1:]]
+        url = reverse('posts:comments', args=[self.post.id])
+        while True:
+            last = response.context['comments'].thread[-1]
+            if not getattr(last, 'more_after', None):
+                break
+            response = self.client.get(
+                url, {'root': last.more_root, 'after': last.more_after}
+            )
+            self.assertWithinQueryBudget(response)
+            thread = response.context['comments'].thread
+            self.assertLessEqual(len(thread), 5)
+            seen += [c.id for c in thread]
+        self.assertEqual(seen, [c.id for c in replies])
+
+    def test_reply_to_comment(self):
+        """Ответ сохраняется с родителем, чужой родитель отбрасывается."""
+        url = reverse('posts:add_comment', args=[self.post.id])
+        self.client.post(url, {'text': 'Ответ', 'parent': self.root.id})
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, self.root)
+        other = Post.objects.create(author=self.author, text='Другой')
+        foreign = Comment.objects.create(
+            post=other, author=self.author, text='Чужой'
+        )
+        self.client.post(url, {'text': 'Мимо', 'parent': foreign.id})
+        self.assertIsNone(Comment.objects.get(text='Мимо').parent)
+
+    def test_reply_form(self):
+        """По ?reply= форма несёт id родителя."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id]),
+            {'reply': self.root.id},
+        )
+        self.assertContains(
+            response, f'name="parent" value="{self.root.id}"'
+        )
@@ -0,0 +1,119 @@
+"""Ветки комментариев на материализованных путях (Comment.path).
+
+Страница веток — это страница комментариев к посту (parent пуст),
+выбранная курсором, и первые REPLIES_PAGIN ответов на каждый из них,
+дочитанные одним запросом по диапазонам путей. Ответы приходят уже в
+порядке отрисовки, поэтому шаблон выводит ветку одним плоским циклом
+с отступом по depth. Остаток широкой ветки догружается кнопкой под
+последним показанным ответом, курсором служит его путь.
+"""
+from django.conf import settings
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, LPad
+
+from .models import PATH_SEGMENT, Comment, path_segment
+
+
+def fill_root_paths():
+    """Проставляет пути комментариям, созданным в обход save().
+
+    bulk_create не вызывает save(), поэтому после массовой вставки
+    комментариев без parent их путь собирается в базе.
+    """
+    Comment.objects.filter(path='', parent__isnull=True).update(
+        path=LPad(Cast('id', CharField()), PATH_SEGMENT, Value('0'))
+    )
+
+
+def first_replies(post_id, root_ids, limit):
+    """Условие WHERE на id первых limit ответов каждого корня.
+
+    На каждый корень — своя выборка по диапазону путей с LIMIT, так
+    что база читает не больше limit строк ветки, как бы широка она ни
+    была. Отдаёт (sql, params) для QuerySet.extra: через id__in Django
+    обернул бы UNION в лишние скобки, и SQLite счёл бы его скаляром.
+    """
+    table = Comment._meta.db_table
+    part = (
+        f'SELECT * FROM (SELECT id FROM {table} '
+        f'WHERE post_id = %s AND path > %s AND path < %s '
+        f'ORDER BY path LIMIT %s) branch'
+    )
+    params = []
+    for root_id in root_ids:
+        root_path = path_segment(root_id)
+        params += [post_id, root_path, root_path + '~', limit]
+    union = ' UNION ALL '.join([part] * len(root_ids))
+    return f'{table}.id IN ({union})', params
+
+
+def mark_more(root_id, shown, limit):
+    """Обрезает ответы до limit и отмечает, откуда догружать остаток."""
+    if len(shown) > limit:
+        shown = shown[:limit]
+        shown[-1].more_root = root_id
+        shown[-1].more_after = shown[-1].path
+    return shown
+
+
+def replies(post_id, roots, limit=None):
+    """Первые limit ответов на комментарии roots одним запросом.
+
+    Отдаёт {id корня: [ответы в порядке отрисовки]}. Если ответов
+    больше, у последнего показанного есть more_root и more_after для
+    ссылки на more_replies().
+    """
+    if not roots:
+        return {}
+    limit = limit or settings.REPLIES_PAGIN
+    ids = [root.id for root in roots]
+    where, params = first_replies(post_id, ids, limit + 1)
+    found = Comment.objects.select_related('author').extra(
+        where=[where], params=params
+    ).order_by()
+    result = {pk: [] for pk in ids}
+    for comment in sorted(found, key=lambda reply: reply.path):
+        result[int(comment.path[:PATH_SEGMENT])].append(comment)
+    return {
+        root_id: mark_more(root_id, shown, limit)
+        for root_id, shown in result.items()
+    }
+
+
+class Replies:
+    """Догрузка ответов одной ветки в виде страницы веток для шаблона."""
+
+    def __init__(self, thread):
+        self.thread = thread
+
+    def has_next(self):
+        return False
+
+
+def more_replies(post_id, root_id, after, limit=None):
+    """Следующие limit ответов корня root_id после пути after.
+
+    Отдаёт None, если after не лежит в ветке root_id.
+    """
+    limit = limit or settings.REPLIES_PAGIN
+    root_path = path_segment(root_id)
+    if not after.isdigit() or not after.startswith(root_path):
+        return None
+    rows = list(
+        Comment.objects
+        .filter(post_id=post_id, path__gt=after, path__lt=root_path + '~')
+        .select_related('author')
+        .order_by('path')[:limit + 1]
+    )
+    return Replies(mark_more(root_id, rows, limit))
+
+
+def thread_page(paginator, cursor, post_id):
+    """Страница корней с атрибутом thread: корни и ответы подряд."""
+    page = paginator.get_page(cursor)
+    roots = list(page)
+    found = replies(post_id, roots)
+    page.thread = [
+        comment for root in roots for comment in [root, *found[root.id]]
+    ]
+    return page
@@ -0,0 +1,215 @@
+"""Миниатюры картинок постов, которые готовит фоновый пул потоков.
+
+Шаблоны не вызывают Pillow в потоке запроса и не ходят в хранилище
+sorl: пул делает варианты картинки нескольких ширин во всех форматах,
+которые умеет сохранять Pillow, и записывает их список в
+Post.image_variants. По нему шаблон строит <picture> со srcset, и
+мобильный браузер скачивает копию по ширине экрана, а пока списка нет,
+показывает заглушку. Миниатюру ставит в очередь сохранение поста с
+новой картинкой, а после её готовности пост помечается изменённым,
+чтобы кэш фрагментов перестал отдавать заглушку.
+
+Глубина очереди и время обработки копятся в общем кэше и видны всем
+процессам через команду thumbnail_stats.
+"""
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, features
+from sorl.thumbnail import default
+
+from core import jobs
+
+logger = logging.getLogger(__name__)
+
+# Размер и параметры миниатюры, общие для всех шаблонов постов.
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Ширины вариантов; высота сохраняет пропорции GEOMETRY. Ширина
+# основной миниатюры входит всегда, остальные — если картинка не уже,
+# так что JPEG этой ширины и есть основная миниатюра.
+WIDTHS = (480, 960, 1440)
+# Форматы от лучшего сжатия к худшему; JPEG остаётся запасным.
+FORMATS = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+STATS_PREFIX = 'thumbnail-stats:'
+STATS_FIELDS = ('queued', 'done', 'skipped', 'failed', 'total_ms', 'max_ms')
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def _shift(field, delta):
+    key = STATS_PREFIX + field
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def variant_formats():
+    """Форматы вариантов, которые умеет сохранять установленный Pillow."""
+    return [
+        fmt for fmt in FORMATS
+        if fmt == 'JPEG' or features.check(fmt.lower())
+    ]
+
+
+def make_variants(name):
+    """Делает варианты картинки и отдаёт их описание для image_variants."""
+    base_width, base_height = map(int, GEOMETRY.split('x'))
+    with default_storage.open(name) as source:
+        width = Image.open(source).size[0]
+    widths = [w for w in WIDTHS if w <= width or w == base_width]
+    variants = {}
+    for fmt in variant_formats():
+        variants[fmt] = []
+        for w in widths:
+            h = round(w * base_height / base_width)
+            thumbnail = default.backend.get_thumbnail(
+                name, f'{w}x{h}', format=fmt, **OPTIONS
+            )
+            variants[fmt].append(
+                {'name': thumbnail.name, 'width': w, 'height': h}
+            )
+    return variants
+
+
+def picture(post):
+    """Данные для <picture> поста или None, пока вариантов нет."""
+    variants = post.variants
+    if not variants:
+        return None
+
+    def srcset(items):
+        return ', '.join(
+            f'{default.storage.url(item["name"])} {item["width"]}w'
+            for item in items
+        )
+    fallback = variants['JPEG']
+    base_width = int(GEOMETRY.split('x')[0])
+    src = next(
+        (item for item in fallback if item['width'] == base_width),
+        fallback[-1],
+    )
+    return {
+        'sources': [
+            {'type': FORMATS[fmt], 'srcset': srcset(items)}
+            for fmt, items in variants.items() if fmt != 'JPEG'
+        ],
+        'src': default.storage.url(src['name']),
+        'srcset': srcset(fallback),
+        'sizes': SIZES,
+        'width': src['width'],
+        'height': src['height'],
+    }
+
+
+def render(name):
+    """Делает миниатюру и варианты картинки name.
+
+    Отдаёт время работы в мс или None, если файла нет. Посты с этой
+    картинкой получают список вариантов и помечаются изменёнными.
+    """
+    from .models import Post
+    from .signals import expire, post_generations
+
+    try:
+        exists = default_storage.exists(name)
+    except SuspiciousFileOperation:
+        exists = False
+    if not exists:
+        logger.warning('Нет файла %s, миниатюра пропущена', name)
+        _shift('skipped', 1)
+        return None
+    started = time.monotonic()
+    variants = json.dumps(make_variants(name))
+    elapsed = round((time.monotonic() - started) * 1000)
+    _shift('done', 1)
+    _shift('total_ms', elapsed)
+    if elapsed > cache.get(STATS_PREFIX + 'max_ms', 0):
+        cache.set(STATS_PREFIX + 'max_ms', elapsed, None)
+    logger.info('Миниатюра %s готова за %s мс', name, elapsed)
+    posts = Post.objects.filter(image=name).select_related('author')
+    names = [
+        generation for post in posts for generation in post_generations(post)
+    ]
+    posts.update(updated=timezone.now(), image_variants=variants)
+    # Сначала запись, потом сброс: иначе запрос между ними снова
+    # положил бы в кэш старые варианты под новым поколением. Миниатюры
+    # делаются вне транзакции, и UPDATE к этому моменту уже виден.
+    expire(*names)
+    return elapsed
+
+
+def _run(name):
+    try:
+        render(name)
+    except Exception:
+        logger.exception('Не удалось сделать миниатюру %s', name)
+        _shift('failed', 1)
+    finally:
+        _shift('queued', -1)
+
+
+def _work(name):
+    try:
+        _run(name)
+    finally:
+        # Поток пула живёт долго: соединение с базой закрываем сами.
+        connections.close_all()
+
+
+def schedule(name):
+    """Ставит миниатюру в очередь после фиксации транзакции.
+
+    Без воркера очереди (JOBS_EAGER) миниатюру делает пул потоков
+    процесса или, с THUMBNAIL_SYNC, сам поток запроса, иначе — задача
+    posts.thumbnail.
+    """
+    if not settings.JOBS_EAGER:
+        jobs.enqueue('posts.thumbnail', name, key=f'thumbnail:{name}')
+        return
+
+    def submit():
+        _shift('queued', 1)
+        if settings.THUMBNAIL_SYNC:
+            _run(name)
+        else:
+            get_executor().submit(_work, name)
+    transaction.on_commit(submit)
+
+
+def stats():
+    """Глубина очереди и время обработки по всем процессам."""
+    values = cache.get_many([STATS_PREFIX + field for field in STATS_FIELDS])
+    result = {
+        field: values.get(STATS_PREFIX + field, 0) for field in STATS_FIELDS
+    }
+    result['avg_ms'] = (
+        result['total_ms'] / result['done'] if result['done'] else 0.0
+    )
+    return result
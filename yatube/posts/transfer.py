@@ -0,0 +1,249 @@
+"""Потоковые выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Формат — NDJSON (объект JSON на строку) или CSV с заголовком; ссылки
+на другие строки хранятся id, поэтому загружать файлы нужно в порядке
+group, post, comment, follow. Выгрузка идёт iterator(chunk_size) по
+возрастанию id и может продолжиться после обрыва с последнего id в
+файле. Загрузка пишет пачками bulk_create без сигналов, каждая пачка
+в своей транзакции, а номер последней сохранённой строки лежит рядом
+с файлом в <файл>.progress. Счётчики, поисковый индекс и ленты
+пересчитываются один раз в конце.
+"""
+import csv
+import json
+import os
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import transaction
+
+from core import fragments
+
+from . import counters, feed, search, threads
+from .models import Comment, Follow, Group, Post
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = (NDJSON, CSV)
+
+FIELDS = {
+    'group': (Group, ('id', 'title', 'slug', 'description')),
+    'post': (Post, ('id', 'author_id', 'group_id', 'text', 'pub_date',
+                    'updated', 'image')),
+    'comment': (Comment, ('id', 'post_id', 'author_id', 'parent_id', 'path',
+                          'text', 'created')),
+    'follow': (Follow, ('id', 'user_id', 'author_id', 'created')),
+}
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Даёт записать свои значения в поля с auto_now и auto_now_add."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def guess_format(path):
+    return CSV if path.endswith('.csv') else NDJSON
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def trim_partial_line(path):
+    """Обрезает файл после последней строки, закончившейся переводом.
+
+    Выгрузка, прерванная посреди записи, оставляет в конце обрывок
+    строки; дописывать после него нельзя, иначе файл не прочитать.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r+b') as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 64 * 1024)
+            file.seek(start)
+            newline = file.read(position - start).rfind(b'\n')
+            if newline != -1:
+                file.truncate(start + newline + 1)
+                return
+            position = start
+        file.truncate(0)
+
+
+def last_exported_id(path):
+    """id последней полностью записанной строки NDJSON."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return None
+    with open(path, 'rb') as file:
+        file.seek(max(0, os.path.getsize(path) - 64 * 1024))
+        lines = file.read().decode('utf-8', 'ignore').splitlines()
+    for line in reversed(lines):
+        try:
+            return int(json.loads(line)['id'])
+        except (ValueError, KeyError):
+            continue
+    return None
+
+
+def trim_partial_record(path):
+    """Обрезает CSV после последней целой записи и отдаёт её id.
+
+    Текст в кавычках может содержать переводы строк, поэтому по хвосту
+    файла границу записи не найти: файл читается csv-модулем целиком,
+    а конец записи — это конец последней прочитанной для неё строки.
+    """
+    if not os.path.exists(path):
+        return None
+    read = 0
+    complete = True
+
+    def lines(file):
+        nonlocal read, complete
+        for line in iter(file.readline, b''):
+            read += len(line)
+            complete = line.endswith(b'\n')
+            yield line.decode('utf-8', 'ignore')
+
+    end, last_id = 0, None
+    with open(path, 'r+b') as file:
+        try:
+            for row in csv.reader(lines(file), strict=True):
+                if not complete:
+                    break
+                end = read
+                if row and row[0].isdigit():
+                    last_id = int(row[0])
+        except csv.Error:
+            # Файл оборван внутри кавычек.
+            pass
+        file.truncate(end)
+    return last_id
+
+
+def resume_point(path, fmt):
+    """Готовит файл к дописыванию; отдаёт id, после которого продолжить."""
+    if fmt == CSV:
+        return trim_partial_record(path)
+    trim_partial_line(path)
+    return last_exported_id(path)
+
+
+def export_rows(kind, file, fmt, after_id=None, chunk_size=2000,
+                header=True):
+    """Пишет строки модели kind в file; отдаёт число строк по мере записи."""
+    model, fields = FIELDS[kind]
+    rows = model.objects.order_by('id')
+    if after_id is not None:
+        rows = rows.filter(id__gt=after_id)
+    rows = rows.values_list(*fields).iterator(chunk_size=chunk_size)
+    writer = csv.writer(file) if fmt == CSV else None
+    if writer and header:
+        writer.writerow(fields)
+    written = 0
+    for row in rows:
+        row = [_plain(value) for value in row]
+        if writer:
+            writer.writerow(['' if value is None else value for value in row])
+        else:
+            file.write(json.dumps(dict(zip(fields, row)), ensure_ascii=False))
+            file.write('\n')
+        written += 1
+        if written % chunk_size == 0:
+            yield written
+    yield written
+
+
+def read_rows(file, fmt):
+    if fmt == CSV:
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def build(kind, record):
+    """Объект модели из строки файла."""
+    model, fields = FIELDS[kind]
+    values = {}
+    for name in fields:
+        if name not in record:
+            # Поле появилось позже файла — остаётся значение по умолчанию.
+            continue
+        field = model._meta.get_field(name[:-3] if name.endswith('_id')
+                                      else name)
+        value = record.get(name)
+        if value == '' and field.null:
+            value = None
+        values[name] = field.to_python(value)
+    return model(**values)
+
+
+def progress_path(path):
+    return f'{path}.progress'
+
+
+def read_progress(path):
+    try:
+        with open(progress_path(path)) as file:
+            return int(file.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_progress(path, done):
+    with open(progress_path(path), 'w') as file:
+        file.write(str(done))
+
+
+def import_rows(kind, path, fmt, batch_size=2000, resume=True):
+    """Загружает файл пачками; отдаёт число сохранённых строк после пачек.
+
+    Уже существующие id пропускаются, поэтому повторный запуск не
+    создаёт дублей даже без файла прогресса.
+    """
+    model, _ = FIELDS[kind]
+    done = read_progress(path) if resume else 0
+    date_fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    with open(path, newline='', encoding='utf-8') as file:
+        records = islice(read_rows(file, fmt), done, None)
+        with manual_dates(*date_fields):
+            while True:
+                batch = [
+                    build(kind, record)
+                    for record in islice(records, batch_size)
+                ]
+                if not batch:
+                    break
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, ignore_conflicts=True)
+                done += len(batch)
+                write_progress(path, done)
+                yield done
+
+
+def finish_import(kinds):
+    """Пересчитывает то, что при загрузке делали бы сигналы."""
+    if 'comment' in kinds:
+        threads.fill_root_paths()
+    counters.rebuild_counters()
+    if {'post', 'comment'} & set(kinds):
+        search.get_backend().rebuild()
+    if {'post', 'follow'} & set(kinds):
+        feed.rebuild_all_feeds()
+    # Поколения фрагментов зависят от авторов, групп и читателей, и
+    # после массовой загрузки проще сбросить кэш фрагментов целиком.
+    fragments.bump_all()
@@ -0,0 +1,226 @@
+"""Популярные посты и группы по затухающим оценкам.
+
+События — просмотр поста, комментарий, новая подписка на автора —
+копятся в процессе и после ответа сбрасываются в Trend.pending
+атомарным UPDATE. Периодическая задача fold() переносит накопленный
+вес в оценки и кладёт в кэш готовые top-N списки, поэтому страница
+читает один ключ кэша и ничего не сортирует.
+
+Оценка падает вдвое за TRENDING_HALF_LIFE. Чтобы не переписывать все
+строки при каждом пересчёте, хранится логарифм оценки, приведённой к
+началу эпохи: событие веса w в момент t добавляет w * exp(λt), и
+такие оценки сравнимы в любой момент без поправки на время. В
+логарифмах сложение превращается в logaddexp, и числа не переполняются.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Group, Post, Trend
+
+TOP_PREFIX = 'trending:'
+# Как и статистика фрагментов, события сбрасываются пачками.
+FLUSH_EVERY = 100
+FLUSH_SECONDS = 10
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def rate():
+    """λ: скорость затухания в секунду."""
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def log_weight(weight, moment):
+    """Логарифм веса события, приведённого к началу эпохи."""
+    return math.log(weight) + rate() * moment.timestamp()
+
+
+def logaddexp(a, b):
+    """log(exp(a) + exp(b)) без переполнения; None — пустая оценка."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def current(score, moment):
+    """Оценка в весах событий на момент moment."""
+    return math.exp(score - rate() * moment.timestamp())
+
+
+def record(event, kind, object_id):
+    """Учитывает событие: 'view', 'comment' или 'follow'."""
+    weight = settings.TRENDING_WEIGHTS[event]
+    with _pending_lock:
+        _pending[kind, object_id] += weight
+
+
+def flush_if_due():
+    with _pending_lock:
+        due = _pending and (
+            sum(_pending.values()) >= FLUSH_EVERY
+            or time.monotonic() - _flushed_at > FLUSH_SECONDS
+        )
+    if due:
+        flush()
+
+
+def flush():
+    """Переносит накопленные в процессе события в Trend.pending."""
+    global _flushed_at
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    if not pending:
+        return
+    with transaction.atomic():
+        Trend.objects.bulk_create(
+            [Trend(kind=kind, object_id=pk) for kind, pk in pending],
+            ignore_conflicts=True,
+        )
+        for (kind, pk), weight in pending.items():
+            Trend.objects.filter(kind=kind, object_id=pk).update(
+                pending=F('pending') + weight
+            )
+
+
+def latest_posts(author_ids, since):
+    """Самый новый пост каждого автора не старше since: {автор: пост}."""
+    rows = (
+        Post.objects
+        .filter(author_id__in=author_ids, pub_date__gte=since)
+        .order_by('author_id', '-pub_date', '-id')
+        .values_list('author_id', 'id')
+    )
+    latest = {}
+    for author_id, post_id in rows:
+        latest.setdefault(author_id, post_id)
+    return latest
+
+
+def deltas(rows, now):
+    """Прибавки оценок по (kind, id) из строк с новыми событиями.
+
+    Вес подписки достаётся ещё и свежему посту автора, а вес поста —
+    его группе.
+    """
+    result = Counter()
+    authors = Counter()
+    for _, kind, pk, weight in rows:
+        result[kind, pk] += weight
+        if kind == Trend.AUTHOR:
+            authors[pk] += weight
+    since = now - timedelta(seconds=settings.TRENDING_FOLLOW_WINDOW)
+    for author_id, post_id in latest_posts(authors, since).items():
+        result[Trend.POST, post_id] += authors[author_id]
+    posts = [pk for kind, pk in result if kind == Trend.POST]
+    groups = (
+        Post.objects.filter(id__in=posts, group__isnull=False)
+        .values_list('id', 'group_id')
+    )
+    for post_id, group_id in groups:
+        result[Trend.GROUP, group_id] += result[Trend.POST, post_id]
+    return result
+
+
+def fold(now=None):
+    """Переносит новые события в оценки и публикует списки.
+
+    Отдаёт число пересчитанных оценок.
+    """
+    flush()
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Trend.objects.filter(pending__gt=0)
+            .values_list('id', 'kind', 'object_id', 'pending')
+        )
+        changes = deltas(rows, now)
+        Trend.objects.bulk_create(
+            [Trend(kind=kind, object_id=pk) for kind, pk in changes],
+            ignore_conflicts=True,
+        )
+        for kind in {kind for kind, _ in changes}:
+            ids = [pk for kind_, pk in changes if kind_ == kind]
+            scores = Trend.objects.filter(
+                kind=kind, object_id__in=ids
+            ).values_list('id', 'object_id', 'score')
+            for row_id, pk, score in scores:
+                Trend.objects.filter(id=row_id).update(score=logaddexp(
+                    score, log_weight(changes[kind, pk], now)
+                ))
+        # События, пришедшие во время пересчёта, остаются в pending.
+        for row_id, _, _, weight in rows:
+            Trend.objects.filter(id=row_id).update(
+                pending=F('pending') - weight
+            )
+        Trend.objects.filter(
+            pending=0,
+            score__lt=log_weight(settings.TRENDING_MIN_SCORE, now),
+        ).delete()
+    publish()
+    return len(changes)
+
+
+def publish():
+    """Кладёт в кэш готовые списки id по убыванию оценки."""
+    for kind in (Trend.POST, Trend.GROUP):
+        cache.set(TOP_PREFIX + kind, ranked(kind), None)
+
+
+def ranked(kind):
+    return list(
+        Trend.objects.filter(kind=kind, score__isnull=False)
+        .order_by('-score')
+        .values_list('object_id', flat=True)[:settings.TRENDING_SIZE]
+    )
+
+
+def top(kind, limit=None):
+    """id самых популярных объектов kind из готового списка."""
+    ids = cache.get(TOP_PREFIX + kind)
+    if ids is None:
+        # Кэш потерян: список читается из индекса (kind, -score).
+        ids = ranked(kind)
+        cache.set(TOP_PREFIX + kind, ids, None)
+    return ids[:limit or settings.TRENDING_SIZE]
+
+
+def _objects(queryset, ids):
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def trending_posts(limit=None):
+    return _objects(
+        Post.objects.select_related('author', 'group'),
+        top(Trend.POST, limit),
+    )
+
+
+def trending_groups(limit=None):
+    return _objects(Group.objects.all(), top(Trend.GROUP, limit))
+
+
+def counts_views(view):
+    """Засчитывает просмотр поста, в том числе из кэша страниц."""
+    @wraps(view)
+    def wrapper(request, post_id, *args, **kwargs):
+        response = view(request, post_id, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            record('view', Trend.POST, post_id)
+        return response
+    return wrapper
@@ -0,0 +1,109 @@
+"""Приём картинок постов с ограниченной памятью.
+
+Загрузка пишется на диск кусками, а на первом байте сверх
+settings.POST_IMAGE_MAX_BYTES разбор запроса прекращается, и остаток
+тела не читается: форма узнаёт об этом по too_large(request) и вернёт
+ошибку. Проверка картинки читает только заголовок. JPEG пересжимается
+через draft-режим декодера, а остальные форматы, которые декодируются
+целиком, ограничены меньшим числом пикселей (pixel_limit), поэтому
+память на одну загрузку ограничена при любом формате.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from PIL import Image, ImageOps
+
+# Форматы, которые принимаем, и те из них, что пересжимаем.
+# Анимированные картинки не пересжимаются: сохранился бы один кадр.
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+REENCODE_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+# Форматы, которые Pillow умеет декодировать сразу уменьшенными.
+DRAFT_FORMATS = {'JPEG'}
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет файл на диск и прекращает загрузку после лимита размера.
+
+    Запрос помечается атрибутом upload_too_large, а остаток тела не
+    читается.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            self.request.upload_too_large = True
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
+
+
+def too_large(request):
+    """Прервал ли обработчик загрузку запроса из-за размера файла."""
+    return getattr(request, 'upload_too_large', False)
+
+
+def pixel_limit(fmt):
+    """Сколько пикселей можно декодировать для картинки формата fmt."""
+    if fmt in DRAFT_FORMATS:
+        return settings.POST_IMAGE_MAX_PIXELS
+    return min(
+        settings.POST_IMAGE_MAX_PIXELS, settings.POST_IMAGE_MAX_DECODE_PIXELS
+    )
+
+
+def inspect(upload):
+    """Формат и размер картинки по заголовку, без декодирования."""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        return image.format, image.size
+
+
+def needs_rewrite(upload):
+    """Нужно ли пересжать картинку: есть EXIF или она слишком большая."""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if image.format not in REENCODE_FORMATS:
+            return False
+        if getattr(image, 'is_animated', False):
+            return False
+        side = settings.POST_IMAGE_MAX_SIDE
+        return (
+            max(image.size) > side
+            or 'exif' in image.info
+            or bool(image.getexif())
+        )
+
+
+def rewrite(upload):
+    """Новая копия картинки без EXIF, уменьшенная до POST_IMAGE_MAX_SIDE.
+
+    JPEG декодируется сразу в уменьшенном виде (draft), остальные
+    форматы уже ограничены лимитом пикселей из формы. Результат
+    не больше уменьшенной картинки и держится в памяти: временный
+    файл пришлось бы закрывать после сохранения поста.
+    """
+    side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        fmt = image.format
+        image.draft(None, (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.info.pop('exif', None)
+        image.thumbnail((side, side))
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, fmt, quality=90)
+    size = buffer.tell()
+    buffer.seek(0)
+    return InMemoryUploadedFile(
+        buffer, 'image', os.path.basename(upload.name), Image.MIME[fmt],
+        size, None,
+    )
@@ -1,72 +1,279 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db.models import Max, OuterRef, Subquery
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
 
+from core import fragments
+from core.http_cache import anonymous_page, make_etag
+from core.page_cache import cached_page
+from core.queries import query_budget
+
+from . import graph, threads, trending, uploads
+from .counters import get_stats
+from .feed import FeedPaginator
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .paginator import CursorPaginator
+from .search import search as search_posts
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, settings.PAGIN)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def get_page_context(queryset, request, count=None):
+    paginator = CursorPaginator(queryset, settings.PAGIN, count=count)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     return page_obj
 
 
+def post_vary_on(post):
+    """Ключ фрагмента поста: сам пост и то, что видно об авторе и группе.
+
+    Переименование автора или группы не трогает пост, поэтому их поля
+    входят в ключ; для поста без группы шаблон подставит пустую строку.
+    """
+    return [
+        post.id, post.updated, post.author.username,
+        post.author.get_full_name(), getattr(post.group, 'slug', ''),
+    ]
+
+
+def feed_context(page_obj, fragment, generations, vary_on=(),
+                 post_fragments=True):
+    """Контекст ленты с фрагментами, выбранными из кэша одной пачкой.
+
+    Ключи должны совпадать с тегами fragment в шаблоне ленты.
+    """
+    feed_version = fragments.version(*generations)
+    specs = [(fragment, [feed_version, *vary_on, page_obj.paginator.cursor])]
+    if post_fragments:
+        specs += [('post', post_vary_on(post)) for post in page_obj]
+    return {
+        'page_obj': page_obj,
+        'feed_version': feed_version,
+        'fragments': fragments.prefetch(specs),
+    }
+
+
+def follow_generations(request):
+    """Поколения кнопок подписки: у анонима их нет, фрагменты общие."""
+    if not request.user.is_authenticated:
+        return []
+    return [f'follow:{request.user.id}']
+
+
+def newest(posts):
+    """Время последнего изменения среди постов.
+
+    Правка поста не меняет pub_date, поэтому берётся updated: иначе
+    клиент с одним If-Modified-Since получал бы 304 на старую страницу.
+    """
+    return posts.aggregate(newest=Max('updated'))['newest']
+
+
+def index_etag(request):
+    return make_etag('index', ['posts'], request.get_full_path())
+
+
+def index_modified(request):
+    return newest(Post.objects.all())
+
+
+def group_etag(request, slug):
+    return make_etag('group', [f'group:{slug}'], request.get_full_path())
+
+
+def group_modified(request, slug):
+    return newest(Post.objects.filter(group__slug=slug))
+
+
+def profile_etag(request, username):
+    return make_etag(
+        'profile', [f'author:{username}'], request.get_full_path()
+    )
+
+
+def profile_modified(request, username):
+    return newest(Post.objects.filter(author__username=username))
+
+
+def post_meta(request, post_id):
+    """Автор поста и время последнего изменения, один раз на запрос."""
+    if not hasattr(request, '_post_meta'):
+        request._post_meta = (
+            Post.objects.filter(id=post_id).order_by()
+            .annotate(last_comment=Subquery(
+                Comment.objects.filter(post=OuterRef('pk'))
+                .order_by('-created', '-id').values('created')[:1]
+            ))
+            .values_list('author__username', 'updated', 'last_comment')
+            .first()
+        )
+    return request._post_meta
+
+
+def post_etag(request, post_id):
+    meta = post_meta(request, post_id)
+    if meta is None:
+        return None
+    return make_etag('post', [f'post:{post_id}', f'author:{meta[0]}'])
+
+
+def post_modified(request, post_id):
+    meta = post_meta(request, post_id)
+    if meta is None:
+        return None
+    return max(moment for moment in meta[1:] if moment is not None)
+
+
+@query_budget(4)
+@cached_page
+@anonymous_page(index_etag, index_modified)
 def index(request):
-    page_obj = get_page_context(Post.objects.select_related('group').all(),
-                                request)
-    context = {'page_obj': page_obj}
+    page_obj = get_page_context(
+        Post.objects.select_related('author', 'group'), request
+    )
+    context = feed_context(
+        page_obj, 'index_page', ['posts', *follow_generations(request)],
+        vary_on=[request.user.id],
+    )
+    context.update(graph.follow_status_context(request.user, page_obj))
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(5)
+@cached_page
+@anonymous_page(group_etag, group_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = get_page_context(posts, request)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = get_page_context(posts, request, count=group.posts_count)
     context = {
-        'page_obj': page_obj,
         'group': group,
         'posts': posts,
+        **feed_context(
+            page_obj, 'group_page',
+            [f'group:{group.slug}', *follow_generations(request)],
+            vary_on=[request.user.id],
+        ),
+        **graph.follow_status_context(request.user, page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
+@cached_page
+@anonymous_page(profile_etag, profile_modified)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = get_page_context(posts, request)
-    following = False
-    if request.user != author:
-        Follow.objects.filter(user__id=request.user.id, author=author).exists()
-        following = True
+    posts = author.posts.select_related('author', 'group')
+    stats = get_stats(author)
+    page_obj = get_page_context(posts, request, count=stats.posts_count)
+    following = author.id in graph.followed_ids(request.user, [author.id])
     context = {
-        'page_obj': page_obj,
         'posts': posts,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'author': author,
+        **feed_context(
+            page_obj, 'profile_page', [f'author:{author.username}'],
+            post_fragments=False,
+        ),
         'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_context(request, post_id):
+    """Страница веток комментариев поста по курсору на (created, id).
+
+    Курсор листает комментарии к самому посту, ответы на них
+    дочитываются одним запросом (posts.threads). Страница выбирается
+    лениво: при попадании во фрагмент кэша запросов нет вовсе.
+    """
+    root = request.GET.get('root', '')
+    after = request.GET.get('after', '')
+    if root.isdigit():
+        # Догрузка ответов одной широкой ветки после пути after.
+        found = threads.more_replies(post_id, int(root), after)
+        if found is not None:
+            return {
+                'comments': found,
+                'comments_cursor': f'{root}:{after}',
+                'comments_version': fragments.version(f'post:{post_id}'),
+            }
+    cursor = request.GET.get('cursor')
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id, parent__isnull=True)
+        .select_related('author'),
+        settings.COMMENTS_PAGIN, keys=('created', 'id'),
+    )
+    return {
+        'comments': SimpleLazyObject(
+            lambda: threads.thread_page(paginator, cursor, post_id)
+        ),
+        'comments_cursor': cursor,
+        'comments_version': fragments.version(f'post:{post_id}'),
+    }
+
+
+@query_budget(5)
+@trending.counts_views
+@cached_page
+@anonymous_page(post_etag, post_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     form = CommentForm()
+    reply = request.GET.get('reply', '')
     context = {
         'post': post,
         'form': form,
-        'comments': comments
+        'reply_to': int(reply) if reply.isdigit() else None,
+        **comments_context(request, post.id),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(4)
+def comments(request, post_id):
+    """Страница комментариев без обёртки, для догрузки на post_detail."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    return render(
+        request, 'posts/includes/comments.html',
+        {'post': post, **comments_context(request, post.id)},
+    )
+
+
+@query_budget(6)
+def trending_posts(request):
+    """Популярные посты и группы из готовых списков posts.trending."""
+    context = {
+        'posts': trending.trending_posts(),
+        'groups': trending.trending_groups(),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    hits, next_cursor = search_posts(query, cursor)
+    context = {
+        'query': query,
+        'hits': hits,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None
+        files=request.FILES or None,
+        image_too_large=uploads.too_large(request),
     )
     context = {'form': form}
     if request.method != 'POST':
@@ -85,7 +292,8 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        image_too_large=uploads.too_large(request),
     )
     context = {
         'form': form,
@@ -114,28 +322,81 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        parent = request.POST.get('parent', '')
+        if parent.isdigit():
+            # Отвечать можно только на комментарий того же поста.
+            comment.parent = Comment.objects.filter(
+                post=post, id=parent
+            ).first()
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(5)
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page_context(posts, request)
-    context = {'page_obj': page_obj}
+    paginator = FeedPaginator(request.user, settings.PAGIN)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    context = feed_context(
+        page_obj, 'follow_page', ['posts', f'follow:{request.user.id}'],
+        vary_on=[request.user.id],
+    )
+    context['suggestions'] = graph.suggestions(request.user)
     return render(request, 'posts/follow.html', context)
 
 
+def follow_list(request, author, paginator, relation, title):
+    """Страница подписчиков или подписок author с отметкой взаимных."""
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    people = [getattr(follow, relation) for follow in page_obj]
+    mutual = graph.mutual_ids(author, [person.id for person in people])
+    context = {
+        'author': author,
+        'title': title,
+        'page_obj': page_obj,
+        'people': [(person, person.id in mutual) for person in people],
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@query_budget(5)
+def profile_followers(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    paginator = graph.followers(
+        author, count=get_stats(author).followers_count
+    )
+    return follow_list(request, author, paginator, 'user', 'Подписчики')
+
+
+@query_budget(5)
+def profile_following(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    paginator = graph.following(
+        author, count=get_stats(author).following_count
+    )
+    return follow_list(request, author, paginator, 'author', 'Подписки')
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = get_page_context(posts, request)
+    posts = author.posts.select_related('author', 'group')
     if request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
+    stats = get_stats(author)
+    page_obj = get_page_context(posts, request, count=stats.posts_count)
     context = {
-        'page_obj': page_obj,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'author': author,
+        **feed_context(
+            page_obj, 'profile_page', [f'author:{author.username}'],
+            post_fragments=False,
+        ),
         'following': True
     }
     return render(request, 'posts/profile.html', context)
@@ -144,12 +405,18 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    posts = author.posts.select_related('author', 'group')
     Follow.objects.filter(user=request.user, author=author).delete()
-    page_obj = get_page_context(posts, request)
+    stats = get_stats(author)
+    page_obj = get_page_context(posts, request, count=stats.posts_count)
     context = {
-        'page_obj': page_obj,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'author': author,
+        **feed_context(
+            page_obj, 'profile_page', [f'author:{author.username}'],
+            post_fragments=False,
+        ),
         'following': False
     }
     return render(request, 'posts/profile.html', context)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,10 +48,14 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.TemplateProfilerMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,8 +74,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны хранятся в памяти процесса;
+            # core.template_cache прогревает их при старте.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -88,13 +100,32 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite в режиме WAL с PRAGMA из core.backends.sqlite3; соединения
+# переиспользуются между запросами CONN_MAX_AGE секунд.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Реплики для чтения. Локально это копии db.sqlite3, которые обновляет
+# команда sync_replicas; их число задаёт DB_REPLICAS.
+for number in range(1, int(os.getenv('DB_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.replica{number}.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд клиент читает из default после своей записи.
+REPLICA_PIN_SECONDS = 5
+# Сколько секунд живут фрагменты, отрисованные по данным реплики.
+REPLICA_FRAGMENT_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -143,16 +174,141 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGIN = 10
+# Комментариев на странице поста и в каждой догрузке.
+COMMENTS_PAGIN = 20
+# Ответов под каждым комментарием страницы и в каждой догрузке ветки.
+REPLIES_PAGIN = 5
+
+# Авторы с большим числом подписчиков не раздают посты по лентам,
+# их посты подтягиваются в ленту подписок при чтении.
+FEED_FANOUT_LIMIT = 5000
+
+# Рекомендации «кого почитать» (posts.graph): сколько авторов хранить
+# на пользователя и сколько секунд держать их в кэше. Их пересчитывает
+# manage.py build_suggestions, при запросе они только читаются.
+SUGGESTIONS_LIMIT = 10
+SUGGESTIONS_TIMEOUT = 3 * 24 * 60 * 60
+
+# Популярное (posts.trending): вес событий, время, за которое оценка
+# падает вдвое, длина готовых списков и период их пересчёта задачей
+# posts.update_trending. Подписка на автора засчитывается его посту,
+# опубликованному не раньше TRENDING_FOLLOW_WINDOW секунд назад.
+TRENDING_WEIGHTS = {'view': 1, 'comment': 5, 'follow': 10}
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_SIZE = 50
+TRENDING_INTERVAL = 5 * 60
+TRENDING_FOLLOW_WINDOW = 3 * 24 * 60 * 60
+# Строки с оценкой ниже этой (в весах событий на текущий момент)
+# удаляются при пересчёте.
+TRENDING_MIN_SCORE = 0.5
+
+# Бэкенд полнотекстового поиска (posts.search).
+SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+
+# Потоки пула, который готовит миниатюры картинок постов. С
+# THUMBNAIL_SYNC=1 миниатюры делаются сразу после фиксации транзакции
+# в том же потоке.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_SYNC = os.getenv('THUMBNAIL_SYNC') == '1'
+
+# Раскладка времени отрисовки шаблонов по каждому запросу
+# (core.middleware.TemplateProfilerMiddleware).
+TEMPLATE_PROFILING = os.getenv('TEMPLATE_PROFILING') == '1'
+
+# Очередь фоновых задач (core.jobs). По умолчанию задачи выполняются
+# сразу в процессе запроса; с JOBS_EAGER=0 они пишутся в таблицу
+# core_job, и их выполняет manage.py run_jobs.
+JOBS_EAGER = os.getenv('JOBS_EAGER', '1') == '1'
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_MAX_ATTEMPTS = 5
+# Пауза перед повтором удваивается с каждой попыткой до JOB_BACKOFF_MAX.
+JOB_BACKOFF_SECONDS = 5
+JOB_BACKOFF_MAX = 60 * 60
+# Сколько секунд задача принадлежит воркеру, прежде чем её отдадут
+# другому, и сколько хранятся выполненные задачи с их ключами.
+JOB_LEASE_SECONDS = 5 * 60
+JOB_KEEP_SECONDS = 24 * 60 * 60
+
+# Сколько секунд общие кэши (CDN, прокси) держат страницы для
+# анонимов, прежде чем перепроверить их условным запросом.
+ANONYMOUS_PAGE_MAX_AGE = 60
+# Кэш целых страниц для анонимов (core.page_cache) и сколько секунд
+# хранятся страницы; записи сбрасывают свои страницы сразу.
+PAGE_CACHE = True
+PAGE_CACHE_TIMEOUT = 60 * 60
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки всегда пишутся во временный файл, а не в память.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+# Ограничения для картинок постов: размер файла, число пикселей
+# и длинная сторона, до которой уменьшается оригинал.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# Форматы без уменьшающего декодирования (всё, кроме JPEG) Pillow
+# разворачивает в память целиком: до 4 байт на пиксель, около 48 МБ.
+POST_IMAGE_MAX_DECODE_PIXELS = 12_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Кэш общий для всех процессов: файл SQLite на этой машине или Redis,
+# если задан REDIS_URL.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'core.cache_backends.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+# Тесты чистят кэш целиком, поэтому у них свой кэш в памяти процесса,
+# а общий файл или Redis остаются нетронутыми. Миниатюры в тестах
+# делаются без пула: его потоки пережили бы тест, его базу и MEDIA_ROOT.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    THUMBNAIL_SYNC = True
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
 
-CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+# Строка со статистикой SQL пишется на каждый запрос с уровнем DEBUG,
+# а при превышении бюджета view с уровнем WARNING. По умолчанию видны
+# только превышения, QUERY_LOG_LEVEL=DEBUG показывает все запросы.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.queries': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_LOG_LEVEL', 'WARNING'),
+        },
+        'posts.thumbnails': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'core.templates': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'core.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
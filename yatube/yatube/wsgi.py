@@ -11,6 +11,12 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from core import template_cache
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Все шаблоны компилируются до первого запроса, а ошибка в шаблоне
+# останавливает запуск.
+template_cache.warm()